@@ -0,0 +1,547 @@
+"""Замеры скорости расчетов и ввода-вывода фитнес-трекера.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_homework.py --sizes 1000 10000 1000000 \
+        --output bench.json
+
+Результаты выводятся в формате JSON, чтобы их можно было сравнивать
+между версиями.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import homework  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+SEED = 20221018
+INVALID_RATIO = 0.05
+IO_LATENCY = 0.005
+IO_BLOCK = 64 * 1024
+STARTUP_ROWS = 5
+STARTUP_BUDGET = 0.1
+STORE_USERS = 10_000
+QUANTILES = (0.01, 0.5, 0.9, 0.99)
+REPLAY_RATIO = 0.1
+LIVE_RATE = 2000
+LIVE_ROWS = 1000
+BACKFILL_SLO = 1.0
+STORE_DAYS = 365
+INVALID_ROWS = ('MISSING,1,2', 'RUN,1', 'RUN,', ',15,1,90', 'WLK,x,1,75,180')
+SAMPLE_PACKAGES = {
+    'SWM': [720, 1, 80, 25, 40],
+    'RUN': [15000, 1, 75],
+    'WLK': [9000, 1, 75, 180],
+}
+
+
+def generate_row(rnd: random.Random) -> str:
+    """Сгенерировать строку пакета со случайными правдоподобными данными."""
+    if rnd.random() < INVALID_RATIO:
+        return rnd.choice(INVALID_ROWS)
+    workout_type = rnd.choice(('SWM', 'RUN', 'WLK'))
+    duration = round(rnd.uniform(0.25, 3), 3)
+    weight = round(rnd.uniform(45, 120), 1)
+    if workout_type == 'SWM':
+        count_pool = rnd.randint(10, 80)
+        return (
+            f'SWM,{count_pool * 25 * 1000 // 1380},{duration},{weight},'
+            f'25,{count_pool}'
+        )
+    action = rnd.randint(1000, 30000)
+    if workout_type == 'RUN':
+        return f'RUN,{action},{duration},{weight}'
+    return f'WLK,{action},{duration},{weight},{rnd.randint(150, 200)}'
+
+
+def generate_file(path: str, size: int, seed: int = SEED) -> None:
+    rnd = random.Random(seed)
+    with open(path, 'w') as file:
+        for _ in range(size):
+            file.write(generate_row(rnd) + '\n')
+
+
+def measure(statement, number: int, repeat: int = 5) -> dict:
+    """Замерить время вызова statement, секунд на одну операцию."""
+    timings = [
+        seconds / number
+        for seconds in timeit.repeat(statement, number=number, repeat=repeat)
+    ]
+    return {
+        'best': min(timings),
+        'median': statistics.median(timings),
+        'ops_per_sec': 1 / min(timings),
+    }
+
+
+def bench_calculations(number: int) -> dict:
+    results = {}
+    for workout_type, data in SAMPLE_PACKAGES.items():
+        results[f'read_package[{workout_type}]'] = measure(
+            lambda: homework.read_package(workout_type, data), number,
+        )
+        training = homework.read_package(workout_type, data)
+        results[f'get_spent_calories[{workout_type}]'] = measure(
+            training.get_spent_calories, number,
+        )
+        message = training.show_training_info()
+        results[f'get_message[{workout_type}]'] = measure(
+            message.get_message, number,
+        )
+    return results
+
+
+def bench_pipeline(path: str, size: int) -> dict:
+    def run():
+        with open(path, newline='') as reader:
+            homework.run_pipeline(reader, StringIO(), StringIO())
+
+    result = measure(run, number=1, repeat=3)
+    result['rows_per_sec'] = size * result['ops_per_sec']
+    return result
+
+
+def bench_compressed(path: str, size: int) -> dict:
+    """Конвейер по файлу gzip с фоновой распаковкой и без нее."""
+    compressed = path + '.gz'
+    with open(path, 'rb') as source:
+        with homework.open_output(compressed, binary=True) as target:
+            shutil.copyfileobj(source, target)
+    results = {}
+    for name, read_ahead in (('gzip', False), ('gzip_read_ahead', True)):
+        def run():
+            with homework.open_input(compressed, read_ahead) as reader:
+                homework.run_pipeline(reader, StringIO(), StringIO())
+
+        results[name] = measure(run, number=1, repeat=3)
+        results[name]['rows_per_sec'] = size * results[name]['ops_per_sec']
+    os.remove(compressed)
+    return results
+
+
+class SlowReader(io.RawIOBase):
+    """Файл с задержкой на каждое чтение, как на сетевой файловой системе."""
+
+    def __init__(self, file, latency: float = IO_LATENCY) -> None:
+        super().__init__()
+        self.file = file
+        self.latency = latency
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        time.sleep(self.latency)
+        return self.file.readinto(buffer)
+
+
+class SlowWriter(StringIO):
+    def __init__(self, latency: float = IO_LATENCY) -> None:
+        super().__init__()
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency)
+        return super().write(text)
+
+
+def bench_threaded(path: str, size: int) -> dict:
+    """Конвейер и run_threaded при задержках чтения и записи."""
+    results = {}
+    for name, run_with in (
+        ('sequential', homework.run_pipeline),
+        ('threaded', homework.run_threaded),
+    ):
+        def run():
+            with open(path, 'rb', buffering=0) as file:
+                source = io.TextIOWrapper(
+                    io.BufferedReader(SlowReader(file), IO_BLOCK),
+                    newline='',
+                )
+                run_with(source, SlowWriter(), StringIO())
+
+        results[name] = measure(run, number=1, repeat=3)
+        results[name]['rows_per_sec'] = size * results[name]['ops_per_sec']
+    return results
+
+
+def bench_totals(path: str, size: int) -> dict:
+    """Точные итоги Totals против простого сложения float.
+
+    overhead - разница времени накопления, отнесенная ко времени всего
+    конвейера без итогов.
+    """
+    with open(path, newline='') as reader:
+        messages = [
+            result for result in homework.compute_messages(
+                homework.validate_packages(homework.check_packages(
+                    homework.parse_packages(csv.reader(reader)),
+                )),
+            )
+            if isinstance(result, homework.InfoMessage)
+        ]
+
+    def plain():
+        totals = {}
+        for message in messages:
+            sums = totals.setdefault(message.training_type, [0, 0.0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += message.duration
+            sums[2] += message.distance
+            sums[3] += message.calories
+
+    def exact():
+        totals = {}
+        for _ in homework.tally_messages(messages, totals):
+            pass
+
+    def pipeline(tally: bool):
+        def run():
+            with open(path, newline='') as reader:
+                results = homework.compute_messages(
+                    homework.validate_packages(homework.check_packages(
+                        homework.parse_packages(csv.reader(reader)),
+                    )),
+                )
+                if tally:
+                    results = homework.tally_messages(results, {})
+                homework.write_results(results, StringIO(), StringIO())
+        return run
+
+    results = {
+        'plain': measure(plain, number=1, repeat=3),
+        'exact': measure(exact, number=1, repeat=3),
+        'pipeline': measure(pipeline(False), number=1, repeat=3),
+        'pipeline_exact': measure(pipeline(True), number=1, repeat=3),
+    }
+    for result in results.values():
+        result['rows_per_sec'] = size * result['ops_per_sec']
+    results['overhead'] = (
+        results['exact']['best'] - results['plain']['best']
+    ) / results['pipeline']['best']
+    return results
+
+
+def bench_adaptive(path: str, size: int) -> dict:
+    """run_adaptive при разборе файла и при потоке редких строк.
+
+    Для файла сравнивается скорость с run_pipeline при цели задержки
+    по умолчанию и BACKFILL_SLO; live - LIVE_ROWS строк, поступающих
+    с частотой LIVE_RATE в секунду, и задержка строк от чтения до вывода.
+    """
+    def adaptive(slo: float, batchers: list):
+        def run():
+            batchers.append(homework.AdaptiveBatcher(slo))
+            with open(path, newline='') as reader:
+                homework.run_adaptive(
+                    reader, StringIO(), StringIO(), batcher=batchers[-1],
+                )
+        return run
+
+    def pipeline():
+        with open(path, newline='') as reader:
+            homework.run_pipeline(reader, StringIO(), StringIO())
+
+    results = {'pipeline': measure(pipeline, number=1, repeat=3)}
+    for name, slo in (
+        ('adaptive', homework.LATENCY_SLO), ('backfill', BACKFILL_SLO),
+    ):
+        batchers = []
+        results[name] = measure(adaptive(slo, batchers), number=1, repeat=3)
+        results[name]['batcher'] = batchers[-1].snapshot()
+    for result in results.values():
+        result['rows_per_sec'] = size * result['ops_per_sec']
+
+    def live():
+        with open(path, newline='') as reader:
+            for line in islice(reader, LIVE_ROWS):
+                time.sleep(1 / LIVE_RATE)
+                yield line
+
+    batcher = homework.AdaptiveBatcher()
+    homework.run_adaptive(live(), StringIO(), StringIO(), batcher=batcher)
+    results['live'] = batcher.snapshot()
+    return results
+
+
+def bench_dedup(directory: str, path: str, size: int) -> dict:
+    """Конвейер с отбрасыванием повторов точным индексом и фильтрами Блума.
+
+    Доля REPLAY_RATIO строк файла повторяется вскоре после исходной,
+    как при повторной отправке шлюзом.
+    """
+    rnd = random.Random(SEED)
+    replayed = os.path.join(directory, 'replayed.csv')
+    with open(path) as source, open(replayed, 'w') as target:
+        pending = []
+        for line in source:
+            target.write(line)
+            if rnd.random() < REPLAY_RATIO:
+                pending.append(line)
+            if len(pending) > 10:
+                target.writelines(pending)
+                pending = []
+        target.writelines(pending)
+
+    def pipeline(make_index):
+        indexes = []
+
+        def run():
+            indexes.append(make_index())
+            with open(replayed, newline='') as reader:
+                homework.run_pipeline(
+                    reader, StringIO(), StringIO(), dedup=indexes[-1],
+                )
+        return run, indexes
+
+    results = {}
+    for name, make_index in (
+        ('pipeline', lambda: None),
+        ('exact', homework.DedupIndex),
+        ('bloom', lambda: homework.BloomDedupIndex(capacity=size)),
+    ):
+        run, indexes = pipeline(make_index)
+        results[name] = measure(run, number=1, repeat=3)
+        results[name]['rows_per_sec'] = size * results[name]['ops_per_sec']
+        if indexes[-1] is not None:
+            results[name]['dedup_rate'] = indexes[-1].dedup_rate
+            results[name]['false_positive_rate'] = (
+                indexes[-1].false_positive_rate
+            )
+    os.remove(replayed)
+    return results
+
+
+def bench_sketches(path: str, size: int) -> dict:
+    """Скетчи квантилей в конвейере: стоимость, память и погрешность.
+
+    error - наибольшая относительная погрешность квантилей скорости и
+    калорий из QUANTILES по сравнению с точными по всем сообщениям.
+    """
+    def pipeline(sketches: bool):
+        def run():
+            with open(path, newline='') as reader:
+                results = homework.compute_messages(
+                    homework.validate_packages(homework.check_packages(
+                        homework.parse_packages(csv.reader(reader)),
+                    )),
+                )
+                if sketches:
+                    results = homework.sketch_messages(
+                        results, homework.TrainingSketches(),
+                    )
+                homework.write_results(results, StringIO(), StringIO())
+        return run
+
+    sketches = homework.TrainingSketches()
+    values = {}
+    with open(path, newline='') as reader:
+        for result in homework.compute_messages(
+            homework.validate_packages(homework.check_packages(
+                homework.parse_packages(csv.reader(reader)),
+            )),
+        ):
+            if isinstance(result, homework.InfoMessage):
+                sketches.add(result)
+                for metric in homework.SKETCH_METRICS:
+                    values.setdefault(
+                        (result.training_type, metric), [],
+                    ).append(getattr(result, metric))
+    error = 0.0
+    for (training_type, metric), column in values.items():
+        column.sort()
+        for q in QUANTILES:
+            exact = column[int(q * (len(column) - 1))]
+            estimate = sketches.quantile(training_type, metric, q)
+            if exact:
+                error = max(error, abs(estimate - exact) / abs(exact))
+    results = {
+        'pipeline': measure(pipeline(False), number=1, repeat=3),
+        'pipeline_sketches': measure(pipeline(True), number=1, repeat=3),
+    }
+    for result in results.values():
+        result['rows_per_sec'] = size * result['ops_per_sec']
+    results['overhead'] = (
+        results['pipeline_sketches']['best'] / results['pipeline']['best'] - 1
+    )
+    results['bins'] = sum(
+        len(sketch)
+        for metrics in sketches.metrics.values()
+        for sketch in metrics.values()
+    )
+    results['json_bytes'] = len(json.dumps(sketches.as_dict()))
+    results['max_error'] = error
+    results['alpha'] = sketches.alpha
+    return results
+
+
+def bench_store(directory: str, path: str, size: int) -> dict:
+    """Сохранение результатов в ResultStore и время запросов к ним.
+
+    Пользователи и дни назначаются результатам случайно из STORE_USERS и
+    STORE_DAYS. Скорость вставки замеряется в пустую базу обычной и
+    пакетной загрузкой, запросы - по базе после пакетной загрузки.
+    """
+    from datetime import date, timedelta
+
+    rnd = random.Random(SEED)
+    first_day = date(2022, 1, 1)
+    with open(path, newline='') as reader:
+        rows = [
+            (
+                f'user{rnd.randrange(STORE_USERS)}',
+                result.training_type,
+                (first_day + timedelta(rnd.randrange(STORE_DAYS))).isoformat(),
+                result.duration,
+                result.distance,
+                result.speed,
+                result.calories,
+            )
+            for result in homework.compute_messages(
+                homework.validate_packages(homework.check_packages(
+                    homework.parse_packages(csv.reader(reader)),
+                )),
+            )
+            if isinstance(result, homework.InfoMessage)
+        ]
+    database = os.path.join(directory, 'results.db')
+    results = {}
+    for name, bulk in (('insert', False), ('bulk_load', True)):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+        with homework.ResultStore(database) as store:
+            start = time.perf_counter()
+            if bulk:
+                with store.bulk_load():
+                    store.insert_rows(rows)
+            else:
+                store.insert_rows(rows)
+            seconds = time.perf_counter() - start
+        results[name] = {
+            'seconds': seconds,
+            'rows_per_sec': len(rows) / seconds,
+        }
+    last_day = first_day + timedelta(STORE_DAYS - 1)
+    with homework.ResultStore(database) as store:
+        queries = {
+            'top': lambda: store.top('calories'),
+            'top_type': lambda: store.top('speed', training_type='Running'),
+            'totals': lambda: store.totals(),
+            'totals_range': lambda: store.totals(
+                since=last_day - timedelta(30),
+            ),
+            'user_totals': lambda: store.totals('user42', until=last_day),
+        }
+        results['queries'] = {
+            name: measure(query, number=10, repeat=3)
+            for name, query in queries.items()
+        }
+    return results
+
+
+def run_module(*args: str) -> None:
+    subprocess.run(
+        [sys.executable, *args],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def bench_main(path: str, size: int) -> dict:
+    """Полный запуск `python -m homework` как отдельного процесса."""
+    def run():
+        run_module('-m', 'homework', path)
+
+    result = measure(run, number=1, repeat=3)
+    result['rows_per_sec'] = size * result['ops_per_sec']
+    return result
+
+
+def bench_startup(directory: str) -> dict:
+    """Время запуска на коротком файле в сравнении с пустым интерпретатором.
+
+    Разница со временем `python -c pass` - это стоимость импорта пакета,
+    и она не должна превышать STARTUP_BUDGET.
+    """
+    path = os.path.join(directory, 'startup.csv')
+    generate_file(path, STARTUP_ROWS)
+    interpreter = measure(lambda: run_module('-c', 'pass'), 1, repeat=10)
+    main = measure(lambda: run_module('-m', 'homework', path), 1, repeat=10)
+    overhead = main['best'] - interpreter['best']
+    return {
+        'interpreter': interpreter,
+        'main': main,
+        'overhead': overhead,
+        'budget': STARTUP_BUDGET,
+        'within_budget': overhead <= STARTUP_BUDGET,
+    }
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--number', type=int, default=100_000)
+    parser.add_argument('--output', help='файл для результатов JSON')
+    args = parser.parse_args(argv)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': SEED,
+        'invalid_ratio': INVALID_RATIO,
+        'calculations': bench_calculations(args.number),
+        'pipeline': {},
+        'compressed': {},
+        'threaded': {},
+        'totals': {},
+        'adaptive': {},
+        'dedup': {},
+        'sketches': {},
+        'store': {},
+        'main': {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        report['startup'] = bench_startup(directory)
+        for size in args.sizes:
+            path = os.path.join(directory, f'packages_{size}.csv')
+            generate_file(path, size)
+            report['pipeline'][size] = bench_pipeline(path, size)
+            report['compressed'][size] = bench_compressed(path, size)
+            report['threaded'][size] = bench_threaded(path, size)
+            report['totals'][size] = bench_totals(path, size)
+            report['adaptive'][size] = bench_adaptive(path, size)
+            report['dedup'][size] = bench_dedup(directory, path, size)
+            report['sketches'][size] = bench_sketches(path, size)
+            report['store'][size] = bench_store(directory, path, size)
+            report['main'][size] = bench_main(path, size)
+            os.remove(path)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    else:
+        print(text)  # noqa: T201
+    return report
+
+
+if __name__ == '__main__':
+    main()
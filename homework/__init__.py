@@ -0,0 +1,120 @@
+"""Модуль фитнес-трекера для расчета показателей тренировок.
+
+Имена пакета доступны как атрибуты homework, но модули, в которых они
+определены, импортируются при первом обращении: python -m homework
+для небольшого файла не загружает asyncio, пул процессов и т.п.
+"""
+from importlib import import_module
+from typing import Any, List
+
+MODULE_EXPORTS = {
+    'training': (
+        'InvalidInputDataError', 'RejectReason', 'RejectedPackageError',
+        'InfoMessage', 'Training', 'Running', 'SportsWalking', 'Swimming',
+        'cached_metric', 'CachedMetricsMixin', 'make_cached',
+        'TrainingTypes', 'PARAM_LIMITS', 'BatchMetrics', 'TrainingSpec',
+        'TRAINING_REGISTRY', 'REGISTERED_TRAININGS', 'TRAINING_CODES',
+        'MAX_REGISTERED_TRAININGS', 'scalar_batch_metrics',
+        'register_training', 'unregister_training', 'read_package',
+        'compute_batch', 'main',
+    ),
+    'formats': (
+        'MESSAGE_FIELDS', 'BINARY_RECORD', 'UNKNOWN_TRAINING_CODE',
+        'format_text', 'format_csv', 'format_jsonl', 'format_binary',
+        'OUTPUT_FORMATS', 'format_messages',
+    ),
+    'pipeline': (
+        'CHUNK_SIZE', 'ERROR_MESSAGE', 'PipelineStats', 'Package',
+        'parse_packages', 'check_value', 'check_chunk', 'check_packages',
+        'validate_packages', 'compute_messages', 'compute_chunk',
+        'compute_batches', 'iter_chunks', 'write_results', 'run_pipeline',
+        'process_text', 'compute_instrumented', 'run_instrumented',
+    ),
+    'instrumentation': ('Histogram', 'Instrumentation'),
+    'cache': ('CACHE_SIZE', 'ResultCache'),
+    'batch': (
+        'BATCH_MAGIC', 'BATCH_HEADER', 'BATCH_ALIGN', 'TrainingBatch',
+        'convert_to_binary', 'is_batch_file', 'run_batch',
+    ),
+    'server': (
+        'READ_SIZE', 'MAX_LINE_BYTES', 'decode_lines', 'process_lines',
+        'handle_connection', 'start_server', 'serve',
+    ),
+    'threaded': (
+        'BLOCK_CHARS', 'QUEUE_DEPTH', 'read_blocks', 'feed', 'iter_queue',
+        'write_outputs', 'run_threaded',
+    ),
+    'parallel': (
+        'CHUNK_BYTES', 'PENDING_PER_WORKER', 'split_file', 'process_range',
+        'iter_bounded', 'run_parallel',
+    ),
+    'aggregation': (
+        'DAY_SECONDS', 'WEEK_SECONDS', 'MAX_USERS', 'COMPACT_SIZE',
+        'TALLY_COMPACT_SIZE',
+        'exact_partials', 'Totals', 'empty_totals', 'tally_messages',
+        'UserWindows', 'UserAggregator',
+    ),
+    'jobs': (
+        'SUMMARY_FILE', 'ERRORS_EXTENSION', 'OUTPUT_EXTENSIONS', 'ShardResult',
+        'JobSummary', 'find_shards', 'shard_output', 'shard_outputs',
+        'process_shard', 'format_shard', 'run_jobs',
+    ),
+    'sessions': (
+        'SPLIT_KM', 'MAX_SPLITS', 'RECENT_SAMPLES', 'MAX_SESSIONS', 'Split',
+        'RingBuffer', 'Session', 'SessionTracker',
+    ),
+    'batching': (
+        'LATENCY_SLO', 'MIN_BATCH', 'MAX_BATCH', 'AdaptiveBatcher',
+        'BatchQueue', 'run_adaptive',
+    ),
+    'dedup': (
+        'DEDUP_TTL', 'MAX_KEYS', 'BLOOM_CAPACITY',
+        'BLOOM_ERROR', 'package_key', 'DedupIndex', 'BloomFilter',
+        'BloomDedupIndex',
+    ),
+    'sketches': (
+        'RELATIVE_ACCURACY', 'MAX_BINS', 'HLL_PRECISION', 'SKETCH_METRICS',
+        'QuantileSketch', 'HyperLogLog', 'TrainingSketches',
+        'sketch_messages',
+    ),
+    'store': (
+        'STORE_BATCH', 'LEADERS_SIZE', 'METRICS', 'StoredResult', 'day_key',
+        'ResultStore',
+    ),
+    'checkpoint': (
+        'CHECKPOINT_ROWS', 'Checkpoint', 'read_complete_lines',
+        'run_checkpointed',
+    ),
+    'compression': (
+        'READ_AHEAD_BYTES',
+        'READ_AHEAD_BLOCKS',
+        'CodecUnavailableError',
+        'Codec',
+        'CODECS',
+        'detect_codec',
+        'ReadAheadReader',
+        'open_input',
+        'open_output',
+    ),
+    'cli': ('parse_args', 'run_cli'),
+    'client': ('FORMAT_PREFIX', 'ERROR_MARK', 'CLIENT_FORMATS', 'run_client'),
+}
+EXPORTS = {
+    name: module
+    for module, names in MODULE_EXPORTS.items()
+    for name in names
+}
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(f'{__name__}.{module}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *EXPORTS})
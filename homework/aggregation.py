@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from itertools import chain
+from math import fsum, inf, isfinite
+from typing import Dict, Iterable, Iterator, List, Union
+
+from homework.training import InfoMessage, InvalidInputDataError
+
+DAY_SECONDS = 24 * 60 * 60
+WEEK_SECONDS = 7 * DAY_SECONDS
+MAX_USERS = 1_000_000
+COMPACT_SIZE = 8
+TALLY_COMPACT_SIZE = 1024
+
+
+def check_finite(message: InfoMessage) -> None:
+    """Отклонить сообщение с бесконечными или неопределенными итогами."""
+    if not (
+        isfinite(message.duration)
+        and isfinite(message.distance)
+        and isfinite(message.calories)
+    ):
+        raise ValueError(f'Показатели тренировки не конечны: {message}')
+
+
+def exact_partials(values: Iterable[float]) -> List[float]:
+    """Короткий список чисел с той же точной суммой, что у values.
+
+    Первое число - правильно округленная сумма, каждое следующее -
+    правильно округленный остаток, поэтому fsum результата равна
+    fsum(values), а сумма не теряет точности при дальнейшем сложении.
+    Бесконечная или неопределенная сумма возвращается как есть.
+    """
+    values = list(values)
+    partials = []
+    total = fsum(values)
+    if not isfinite(total):
+        return [total]
+    while total:
+        partials.append(total)
+        total = fsum(chain(values, (-partial for partial in partials)))
+    return partials
+
+
+class Totals:
+    """Суммарные показатели группы тренировок.
+
+    Значения duration, distance и calories накапливаются в списках без
+    округления и сжимаются exact_partials, когда список длиннее
+    compact_size или нужна сумма. Поэтому суммы правильно округлены и
+    не зависят от порядка тренировок, размера блоков и числа процессов,
+    а вычитание в скользящем окне не накапливает ошибку. По умолчанию
+    compact_size мал (COMPACT_SIZE), и итоги занимают меньше килобайта,
+    как бы часто ни обновлялись: их миллионы в окнах UserAggregator.
+    Немногим итогам потока (tally_messages) выгоднее сжимать списки
+    реже - TALLY_COMPACT_SIZE.
+    """
+
+    __slots__ = ('trainings', 'columns', 'compact_size')
+
+    def __init__(
+        self,
+        trainings: int = 0,
+        duration: float = 0.0,
+        distance: float = 0.0,
+        calories: float = 0.0,
+        partials: List[List[float]] = None,
+        compact_size: int = COMPACT_SIZE,
+    ) -> None:
+        self.trainings = trainings
+        if partials is None:
+            partials = [[duration], [distance], [calories]]
+        self.columns = [list(column) for column in partials]
+        self.compact_size = compact_size
+
+    def __repr__(self) -> str:
+        return (
+            f'{type(self).__name__}(trainings={self.trainings}, '
+            f'duration={self.duration}, distance={self.distance}, '
+            f'calories={self.calories})'
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Totals):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def _sum(self, index: int) -> float:
+        column = self.columns[index] = exact_partials(self.columns[index])
+        return fsum(column)
+
+    @property
+    def duration(self) -> float:
+        return self._sum(0)
+
+    @property
+    def distance(self) -> float:
+        return self._sum(1)
+
+    @property
+    def calories(self) -> float:
+        return self._sum(2)
+
+    @property
+    def mean_speed(self) -> float:
+        """Средняя скорость за все тренировки группы, км/ч."""
+        duration = self.duration
+        return self.distance / duration if duration else 0.0
+
+    def add(self, message: InfoMessage) -> None:
+        check_finite(message)
+        self.trainings += 1
+        duration, distance, calories = self.columns
+        duration.append(message.duration)
+        distance.append(message.distance)
+        calories.append(message.calories)
+        if len(duration) > self.compact_size:
+            self.compact()
+
+    def compact(self) -> None:
+        self.columns = [exact_partials(column) for column in self.columns]
+
+    def merge(self, other: 'Totals') -> None:
+        self.trainings += other.trainings
+        for column, values in zip(self.columns, other.columns):
+            column.extend(values)
+        self.compact()
+
+    def subtract(self, other: 'Totals') -> None:
+        self.trainings -= other.trainings
+        for column, values in zip(self.columns, other.columns):
+            column.extend(-value for value in values)
+        self.compact()
+
+    def as_dict(self) -> Dict[str, object]:
+        """Итоги для JSON: суммы и точные частичные суммы для загрузки."""
+        self.compact()
+        return {
+            'trainings': self.trainings,
+            'duration': fsum(self.columns[0]),
+            'distance': fsum(self.columns[1]),
+            'calories': fsum(self.columns[2]),
+            'partials': self.columns,
+        }
+
+
+def empty_totals(compact_size: int = COMPACT_SIZE) -> Totals:
+    return Totals(partials=[[], [], []], compact_size=compact_size)
+
+
+def tally_messages(
+    results: Iterable[Union[InfoMessage, InvalidInputDataError]],
+    totals: Dict[str, Totals],
+) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+    """Пропустить результаты дальше, суммируя сообщения по типам."""
+    for result in results:
+        if isinstance(result, InfoMessage):
+            group = totals.get(result.training_type)
+            if group is None:
+                group = totals[result.training_type] = empty_totals(
+                    TALLY_COMPACT_SIZE,
+                )
+            group.add(result)
+        yield result
+
+
+class UserWindows:
+    """Окна одного пользователя: текущее фиксированное и скользящее."""
+
+    __slots__ = (
+        'last_seen', 'window', 'tumbling', 'bucket', 'ring', 'sliding',
+    )
+
+    def __init__(self, buckets: int) -> None:
+        self.last_seen = 0.0
+        self.window = None
+        self.tumbling: Dict[str, Totals] = {}
+        self.bucket = None
+        self.ring: List[Dict[str, Totals]] = [{} for _ in range(buckets)]
+        self.sliding: Dict[str, Totals] = {}
+
+
+class UserAggregator:
+    """Итоги тренировок пользователей по окнам времени.
+
+    Фиксированные окна длиной window начинаются с кратных window
+    моментов времени. Скользящее окно той же длины состоит из
+    window / bucket корзин: при обновлении из суммы вычитаются только
+    устаревшие корзины, поэтому обновление занимает O(1) независимо
+    от истории. Время потока (watermark) - самая поздняя тренировка
+    среди всех пользователей: по нему закончившиеся окна сбрасываются
+    и при запросе итогов, даже если сам пользователь больше не
+    тренировался. Хранится не более max_users пользователей; дольше
+    всех не обновлявшиеся вытесняются первыми, как и пользователи,
+    неактивные дольше idle_timeout секунд.
+    """
+
+    def __init__(
+        self,
+        window: float = WEEK_SECONDS,
+        bucket: float = DAY_SECONDS,
+        max_users: int = MAX_USERS,
+        idle_timeout: float = None,
+    ) -> None:
+        self.window = window
+        self.bucket = bucket
+        self.buckets = max(1, round(window / bucket))
+        self.max_users = max_users
+        self.idle_timeout = idle_timeout
+        self.users: 'OrderedDict[str, UserWindows]' = OrderedDict()
+        self.watermark = -inf
+        self.evicted = 0
+        self.late = 0
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def add(
+        self, user_id: str, timestamp: float, message: InfoMessage,
+    ) -> None:
+        """Учесть тренировку пользователя, завершенную в timestamp."""
+        if not isfinite(timestamp):
+            raise ValueError(f'Время тренировки не конечно: {timestamp}')
+        check_finite(message)
+        state = self.users.get(user_id)
+        if state is None:
+            state = self.users[user_id] = UserWindows(self.buckets)
+        self.users.move_to_end(user_id)
+        state.last_seen = max(state.last_seen, timestamp)
+        self.watermark = max(self.watermark, timestamp)
+        self._add_tumbling(state, timestamp, message)
+        self._add_sliding(state, timestamp, message)
+        self._evict(self.watermark)
+
+    def tumbling(self, user_id: str, now: float = None) -> Dict[str, Totals]:
+        """Итоги фиксированного окна момента now по типам тренировок.
+
+        По умолчанию now - время потока watermark.
+        """
+        state = self.users.get(user_id)
+        if state is None:
+            return {}
+        self._expire(state, self.watermark if now is None else now)
+        return dict(state.tumbling)
+
+    def sliding(self, user_id: str, now: float = None) -> Dict[str, Totals]:
+        """Итоги за window секунд до now по типам тренировок.
+
+        По умолчанию now - время потока watermark.
+        """
+        state = self.users.get(user_id)
+        if state is None:
+            return {}
+        self._expire(state, self.watermark if now is None else now)
+        return {
+            name: totals
+            for name, totals in state.sliding.items()
+            if totals.trainings
+        }
+
+    def _add_tumbling(
+        self, state: UserWindows, timestamp: float, message: InfoMessage,
+    ) -> None:
+        window = int(timestamp // self.window)
+        if state.window is None or window > state.window:
+            state.window = window
+            state.tumbling = {}
+        elif window < state.window:
+            self.late += 1
+            return
+        state.tumbling.setdefault(
+            message.training_type, empty_totals(),
+        ).add(message)
+
+    def _add_sliding(
+        self, state: UserWindows, timestamp: float, message: InfoMessage,
+    ) -> None:
+        bucket = int(timestamp // self.bucket)
+        if state.bucket is None:
+            state.bucket = bucket
+        elif bucket > state.bucket:
+            self._expire_buckets(state, bucket)
+        elif bucket <= state.bucket - self.buckets:
+            self.late += 1
+            return
+        state.ring[bucket % self.buckets].setdefault(
+            message.training_type, empty_totals(),
+        ).add(message)
+        state.sliding.setdefault(
+            message.training_type, empty_totals(),
+        ).add(message)
+
+    def _expire_buckets(self, state: UserWindows, bucket: int) -> None:
+        """Вычесть корзины, вышедшие из окна до корзины bucket."""
+        expired = min(bucket - state.bucket, self.buckets)
+        for step in range(1, expired + 1):
+            slot = state.ring[(state.bucket + step) % self.buckets]
+            for name, totals in slot.items():
+                state.sliding[name].subtract(totals)
+            slot.clear()
+        state.bucket = bucket
+
+    def _expire(self, state: UserWindows, now: float) -> None:
+        """Сбросить окна пользователя, закончившиеся к моменту now."""
+        window = int(now // self.window)
+        if state.window is not None and window > state.window:
+            state.window = window
+            state.tumbling = {}
+        bucket = int(now // self.bucket)
+        if state.bucket is not None and bucket > state.bucket:
+            self._expire_buckets(state, bucket)
+
+    def _evict(self, now: float) -> None:
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+            self.evicted += 1
+        if self.idle_timeout is None:
+            return
+        while self.users:
+            user_id, state = next(iter(self.users.items()))
+            if now - state.last_seen <= self.idle_timeout:
+                break
+            del self.users[user_id]
+            self.evicted += 1
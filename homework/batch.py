@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import csv
+import mmap
+import os
+import sys
+from array import array
+from itertools import chain, repeat
+from struct import Struct
+from typing import IO, BinaryIO, List, Sequence, TextIO
+
+from homework.formats import format_messages
+from homework.pipeline import (
+    CHUNK_SIZE, ERROR_MESSAGE, PipelineStats, check_packages, parse_packages,
+)
+from homework.training import (
+    REGISTERED_TRAININGS, TRAINING_REGISTRY, BatchMetrics, InfoMessage,
+    InvalidInputDataError, Training, compute_batch,
+)
+
+BATCH_MAGIC = b'TRPK'
+BATCH_HEADER = Struct('<4s4xQ')
+BATCH_ALIGN = 8
+
+
+class TrainingBatch:
+    """Столбцовое хранилище тренировок.
+
+    Тренировка занимает 41 байт: код типа (1 байт) и пять параметров
+    по 8 байт, неиспользуемые параметры равны нулю. Массивы при росте
+    резервируют до ~12% сверх этого объема. Код типа - номер
+    в REGISTERED_TRAININGS, поэтому дополнительные типы тренировок
+    должны регистрироваться в одном порядке при записи и чтении.
+    """
+
+    __slots__ = ('codes', 'columns')
+
+    MAX_PARAMS = 5
+
+    def __init__(self) -> None:
+        self.codes = array('B')
+        self.columns = tuple(array('d') for _ in range(self.MAX_PARAMS))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Training:
+        spec = REGISTERED_TRAININGS[self.codes[index]]
+        return spec.training(*[
+            column[index] for column in self.columns[:len(spec.params)]
+        ])
+
+    def append(self, workout_type: str, data: List[float]) -> None:
+        """Добавить пакет данных в хранилище."""
+        spec = TRAINING_REGISTRY.get(workout_type)
+        if (
+            spec is None
+            or len(spec.params) != len(data)
+            or len(data) > self.MAX_PARAMS
+        ):
+            raise InvalidInputDataError(
+                f'Некорректный пакет {workout_type}: {data}',
+            )
+        self.codes.append(spec.index)
+        for column, value in zip(
+            self.columns, chain(data, repeat(0.0)),
+        ):
+            column.append(value)
+
+    @classmethod
+    def from_buffers(
+        cls, codes: Sequence[int], columns: Sequence[Sequence[float]],
+    ) -> 'TrainingBatch':
+        """Создать хранилище поверх готовых буферов без копирования."""
+        batch = cls.__new__(cls)
+        batch.codes = codes
+        batch.columns = tuple(columns)
+        return batch
+
+    def get_metrics(
+        self, start: int = 0, stop: int = None,
+    ) -> BatchMetrics:
+        """Рассчитать дистанцию, скорость и калории тренировок."""
+        return compute_batch(
+            [
+                REGISTERED_TRAININGS[code].code
+                for code in self.codes[start:stop]
+            ],
+            [column[start:stop] for column in self.columns],
+        )
+
+    def get_messages(
+        self, start: int = 0, stop: int = None,
+    ) -> List[InfoMessage]:
+        """Получить информационные сообщения о тренировках.
+
+        Длительность берется из столбца параметра duration своего
+        типа тренировки.
+        """
+        names = [spec.training.__name__ for spec in REGISTERED_TRAININGS]
+        positions = [
+            spec.params.index('duration') for spec in REGISTERED_TRAININGS
+        ]
+        codes = self.codes[start:stop]
+        if len(set(positions)) == 1:
+            duration = self.columns[positions[0]][start:stop]
+        else:
+            columns = [column[start:stop] for column in self.columns]
+            duration = [
+                columns[positions[code]][index]
+                for index, code in enumerate(codes)
+            ]
+        return list(map(
+            InfoMessage,
+            [names[code] for code in codes],
+            duration,
+            *self.get_metrics(start, stop),
+        ))
+
+    def save(self, file: BinaryIO) -> None:
+        """Записать хранилище в двоичном столбцовом формате.
+
+        Формат: заголовок BATCH_HEADER (сигнатура и число тренировок),
+        коды типов по байту, дополненные нулями до кратности 8, затем
+        столбцы параметров float64 little-endian.
+        """
+        file.write(BATCH_HEADER.pack(BATCH_MAGIC, len(self)))
+        file.write(bytes(self.codes))
+        file.write(bytes(-len(self) % BATCH_ALIGN))
+        for column in self.columns:
+            column = array('d', column)
+            if sys.byteorder != 'little':
+                column.byteswap()
+            file.write(column.tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'TrainingBatch':
+        """Отобразить файл хранилища в память без копирования данных.
+
+        Размер файла сверяется с числом тренировок в заголовке, а коды
+        типов - с REGISTERED_TRAININGS, чтобы поврежденный файл
+        отклонялся при чтении, а не при расчете.
+        """
+        if sys.byteorder != 'little':
+            raise InvalidInputDataError(
+                'Чтение без копирования требует little-endian платформы',
+            )
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < BATCH_HEADER.size:
+                raise InvalidInputDataError(f'{path}: файл короче заголовка')
+            buffer = memoryview(
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ),
+            )
+        magic, size = BATCH_HEADER.unpack_from(buffer)
+        if magic != BATCH_MAGIC:
+            raise InvalidInputDataError(f'{path} не является файлом пакетов')
+        expected = (
+            BATCH_HEADER.size + size + -size % BATCH_ALIGN
+            + cls.MAX_PARAMS * size * BATCH_ALIGN
+        )
+        if len(buffer) != expected:
+            raise InvalidInputDataError(
+                f'{path}: для {size} тренировок нужно {expected} байт, '
+                f'в файле {len(buffer)}',
+            )
+        offset = BATCH_HEADER.size
+        codes = buffer[offset:offset + size]
+        unknown = codes.tobytes().translate(
+            None, bytes(range(len(REGISTERED_TRAININGS))),
+        )
+        if unknown:
+            raise InvalidInputDataError(
+                f'{path}: неизвестный код типа тренировки {unknown[0]}',
+            )
+        offset += size + -size % BATCH_ALIGN
+        columns = []
+        for _ in range(cls.MAX_PARAMS):
+            end = offset + size * BATCH_ALIGN
+            columns.append(buffer[offset:end].cast('d'))
+            offset = end
+        return cls.from_buffers(codes, columns)
+
+
+def convert_to_binary(
+    source: TextIO, path: str, error_sink: TextIO,
+) -> PipelineStats:
+    """Преобразовать пакеты CSV в двоичный файл TrainingBatch."""
+    stats = PipelineStats()
+    batch = TrainingBatch()
+    for package in check_packages(parse_packages(csv.reader(source))):
+        try:
+            if isinstance(package, InvalidInputDataError):
+                raise package
+            batch.append(*package)
+            stats.processed += 1
+        except InvalidInputDataError as err:
+            error_sink.write(ERROR_MESSAGE.format(err) + '\n')
+            stats.rejected += 1
+    with open(path, 'wb') as file:
+        batch.save(file)
+    return stats
+
+
+def is_batch_file(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(BATCH_MAGIC)) == BATCH_MAGIC
+
+
+def run_batch(
+    batch: TrainingBatch,
+    sink: IO,
+    chunk_size: int = CHUNK_SIZE,
+    output_format: str = 'text',
+) -> PipelineStats:
+    """Рассчитать и вывести показатели всех тренировок хранилища."""
+    for start in range(0, len(batch), chunk_size):
+        sink.write(format_messages(
+            batch.get_messages(start, start + chunk_size), output_format,
+        ))
+    return PipelineStats(processed=len(batch))
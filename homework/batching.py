@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from math import inf
+from time import perf_counter
+from typing import (
+    IO, TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional,
+    TextIO, Tuple,
+)
+
+from homework.pipeline import PipelineStats, process_text
+
+if TYPE_CHECKING:
+    from homework.cache import ResultCache
+    from homework.dedup import DedupIndex
+    from homework.instrumentation import Instrumentation
+
+LATENCY_SLO = 0.05
+SERVICE_SHARE = 0.5
+QUEUE_SHARE = 0.5
+MIN_QUEUE_SHARE = 0.05
+BACKOFF = 0.75
+MIN_BATCH = 1
+MAX_BATCH = 16_384
+INITIAL_BATCH = 64
+MIN_CAPACITY = 1024
+LATENCY_WINDOW = 1024
+SMOOTHING = 0.2
+
+Item = Tuple[float, str]
+
+
+class AdaptiveBatcher:
+    """Размер пакета, интервал отправки и длина очереди по цели задержки.
+
+    После каждого пакета observe() получает время его обработки,
+    задержку самой старой строки (от чтения до вывода) и длину очереди:
+    - обработка дольше SERVICE_SHARE цели slo - размер уменьшается вдвое;
+    - в очереди не меньше пакета и обработка вчетверо быстрее этой
+      доли - размер удваивается, чтобы накладные расходы на пакет
+      делились на больше строк;
+    - flush_interval - сколько ждать заполнения пакета при редких
+      строках: остаток доли обработки после расчета пакета;
+    - capacity - сколько строк очередь принимает до блокировки чтения:
+      столько, сколько обрабатывается за queue_share цели. Доля
+      уменьшается в BACKOFF раз после каждого пакета с задержкой больше
+      slo и медленно растет до QUEUE_SHARE, пока задержки ниже цели.
+
+    Поэтому при потоке редких строк пакеты маленькие и уходят почти
+    сразу, а при разборе архива растут до max_size. Задержки последних
+    LATENCY_WINDOW пакетов и счетчики доступны в snapshot().
+    """
+
+    def __init__(
+        self,
+        slo: float = LATENCY_SLO,
+        min_size: int = MIN_BATCH,
+        max_size: int = MAX_BATCH,
+        size: int = INITIAL_BATCH,
+    ) -> None:
+        self.slo = slo
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min_size, min(size, max_size))
+        self.item_seconds = 0.0
+        self.queue_share = QUEUE_SHARE
+        self.flush_interval = slo * SERVICE_SHARE
+        self.capacity = max(MIN_CAPACITY, self.size)
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.batches = 0
+        self.items = 0
+        self.busy = 0.0
+        self.grown = 0
+        self.shrunk = 0
+        self.violations = 0
+        self.max_depth = 0
+
+    def observe(
+        self, size: int, seconds: float, latency: float, depth: int,
+    ) -> None:
+        """Учесть обработанный пакет и пересчитать параметры."""
+        self.batches += 1
+        self.items += size
+        self.busy += seconds
+        self.latencies.append(latency)
+        self.violations += latency > self.slo
+        self.max_depth = max(self.max_depth, depth)
+        item_seconds = seconds / size
+        self.item_seconds += SMOOTHING * (item_seconds - self.item_seconds)
+        if self.batches == 1:
+            self.item_seconds = item_seconds
+        budget = self.slo * SERVICE_SHARE
+        if seconds > budget and self.size > self.min_size:
+            self.size = max(self.min_size, self.size // 2)
+            self.shrunk += 1
+        elif (
+            depth >= self.size
+            and seconds < budget / 4
+            and self.size < self.max_size
+        ):
+            self.size = min(self.max_size, self.size * 2)
+            self.grown += 1
+        self.flush_interval = max(0.0, budget - self.item_seconds * self.size)
+        if latency > self.slo:
+            self.queue_share = max(
+                MIN_QUEUE_SHARE, self.queue_share * BACKOFF,
+            )
+        elif latency < self.slo * BACKOFF:
+            self.queue_share = min(QUEUE_SHARE, self.queue_share + 0.01)
+        if self.item_seconds:
+            self.capacity = max(
+                self.size,
+                int(self.slo * self.queue_share / self.item_seconds),
+            )
+
+    def percentile(self, q: float) -> float:
+        """q-квантиль задержки последних пакетов, секунд."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'slo': self.slo,
+            'batch_size': self.size,
+            'flush_interval': self.flush_interval,
+            'capacity': self.capacity,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch': self.items / self.batches if self.batches else 0,
+            'items_per_sec': self.items / self.busy if self.busy else 0.0,
+            'latency_p50': self.percentile(0.5),
+            'latency_p99': self.percentile(0.99),
+            'violations': self.violations,
+            'grown': self.grown,
+            'shrunk': self.shrunk,
+            'max_depth': self.max_depth,
+        }
+
+
+class BatchQueue:
+    """Очередь строк со временем чтения, выбираемая пакетами.
+
+    Строки добавляются в deque без блокировки; блокировка нужна, только
+    когда потребитель ждет строк или очередь заполнена до capacity.
+    Так передача строки стоит доли микросекунды, а не нескольких
+    микросекунд, как в queue.Queue.
+    """
+
+    def __init__(self, capacity: int = MIN_CAPACITY) -> None:
+        self.items: Deque[Item] = deque()
+        self.capacity = capacity
+        self.condition = threading.Condition()
+        self.wanted = inf
+        self.full = False
+        self.closed = False
+        self.error: Optional[Exception] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def put(self, line: str) -> None:
+        items = self.items
+        if len(items) >= self.capacity:
+            self._wait_space()
+        items.append((perf_counter(), line))
+        if len(items) >= self.wanted:
+            with self.condition:
+                self.condition.notify_all()
+
+    def _wait_space(self) -> None:
+        with self.condition:
+            self.full = True
+            while len(self.items) >= self.capacity and not self.closed:
+                self.condition.wait()
+            self.full = False
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def wait(self, count: int, deadline: float = inf) -> None:
+        """Ждать count строк, закрытия очереди или момента deadline."""
+        with self.condition:
+            self.wanted = count
+            while len(self.items) < count and not self.closed:
+                timeout = deadline - perf_counter()
+                if timeout <= 0:
+                    break
+                self.condition.wait(None if timeout == inf else timeout)
+            self.wanted = inf
+
+    def take(self, count: int) -> List[Item]:
+        items = self.items
+        batch = [items.popleft() for _ in range(min(count, len(items)))]
+        if self.full:
+            with self.condition:
+                self.condition.notify_all()
+        return batch
+
+
+def feed_lines(lines: Iterable[str], target: BatchQueue) -> None:
+    """Передавать строки в очередь; ошибка чтения сохраняется в ней."""
+    try:
+        for line in lines:
+            if target.closed:
+                return
+            target.put(line)
+    except Exception as error:
+        target.error = error
+    finally:
+        target.close()
+
+
+def run_adaptive(
+    source: TextIO,
+    sink: IO,
+    error_sink: TextIO,
+    output_format: str = 'text',
+    instrumentation: 'Instrumentation' = None,
+    cache: 'ResultCache' = None,
+    dedup: 'DedupIndex' = None,
+    batcher: AdaptiveBatcher = None,
+) -> PipelineStats:
+    """Обработать поток пакетов пакетами переменного размера.
+
+    Поток чтения кладет строки в BatchQueue, основной поток выбирает
+    пакет размером batcher.size, ожидая его заполнения не дольше
+    flush_interval после прихода первой строки, рассчитывает и выводит
+    его. Когда очередь опустела, вывод сбрасывается, чтобы результаты
+    редких строк не задерживались в буфере.
+    """
+    if batcher is None:
+        batcher = AdaptiveBatcher()
+    lines = BatchQueue(batcher.capacity)
+    reader = threading.Thread(
+        target=feed_lines, args=(source, lines), daemon=True,
+    )
+    reader.start()
+    stats = PipelineStats()
+    try:
+        while True:
+            lines.wait(1)
+            if not lines:
+                if lines.error is not None:
+                    raise lines.error
+                break
+            deadline = lines.items[0][0] + batcher.flush_interval
+            lines.wait(batcher.size, deadline)
+            batch = lines.take(batcher.size)
+            start = perf_counter()
+            output, errors, batch_stats = process_text(
+                ''.join([line for _, line in batch]),
+                output_format,
+                instrumentation,
+                cache,
+                dedup,
+            )
+            if output:
+                sink.write(output)
+            if errors:
+                error_sink.write(errors)
+            if not lines:
+                sink.flush()
+            end = perf_counter()
+            batcher.observe(
+                len(batch), end - start, end - batch[0][0], len(lines),
+            )
+            lines.capacity = batcher.capacity
+            stats.processed += batch_stats.processed
+            stats.rejected += batch_stats.rejected
+    finally:
+        lines.close()
+    reader.join()
+    return stats
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import OrderedDict
+from dataclasses import astuple
+from time import time
+from typing import Iterable, Iterator, Sequence, Tuple, Union
+
+from homework.pipeline import Package
+from homework.training import (
+    InfoMessage, InvalidInputDataError, read_package,
+)
+
+CACHE_SIZE = 100_000
+
+
+class ResultCache:
+    """Кэш результатов расчета по содержимому пакета.
+
+    Ключ - код тренировки и кортеж параметров. Хранится не более
+    max_size результатов (вытесняются давно не использованные),
+    результаты старше ttl секунд считаются устаревшими. Кэш можно
+    сохранить на диск и загрузить при следующем запуске.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Package, Tuple[float, InfoMessage]]' = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def get_message(
+        self, workout_type: str, data: Sequence[float],
+    ) -> InfoMessage:
+        """Получить сообщение о тренировке из кэша или рассчитать его."""
+        key = (workout_type, tuple(data))
+        entry = self.entries.get(key)
+        now = time()
+        if entry is not None and (
+            self.ttl is None or now - entry[0] <= self.ttl
+        ):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        message = read_package(workout_type, list(data)).show_training_info()
+        self.entries[key] = (now, message)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return message
+
+    def compute_messages(
+        self, packages: Iterable[Union[Package, InvalidInputDataError]],
+    ) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+        """Этап конвейера, заменяющий validate_packages и compute_messages."""
+        for package in packages:
+            if isinstance(package, InvalidInputDataError):
+                yield package
+                continue
+            try:
+                yield self.get_message(*package)
+            except InvalidInputDataError as err:
+                yield err
+
+    def save(self, path: str) -> None:
+        """Атомарно сохранить кэш в файл JSON."""
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump([
+                [workout_type, data, stored, astuple(message)]
+                for (workout_type, data), (stored, message)
+                in self.entries.items()
+            ], file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(
+        cls, path: str, max_size: int = CACHE_SIZE, ttl: float = None,
+    ) -> 'ResultCache':
+        """Загрузить кэш из файла, если он существует."""
+        cache = cls(max_size, ttl)
+        if not os.path.exists(path):
+            return cache
+        with open(path) as file:
+            for workout_type, data, stored, message in json.load(file):
+                cache.entries[workout_type, tuple(data)] = (
+                    stored, InfoMessage(*message),
+                )
+        while len(cache.entries) > max_size:
+            cache.entries.popitem(last=False)
+        return cache
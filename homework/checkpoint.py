@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import IO, BinaryIO, Dict, List, TextIO
+
+from homework.aggregation import TALLY_COMPACT_SIZE, Totals, tally_messages
+from homework.pipeline import (
+    CHUNK_SIZE, check_packages, compute_batches, parse_packages,
+    write_results,
+)
+
+CHECKPOINT_ROWS = 100_000
+FINGERPRINT_SIZE = 4096
+DEFERRED_MESSAGE = (
+    '{path}: недописанная строка ({size} байт) отложена до следующего '
+    'запуска\n'
+)
+
+
+@dataclass
+class Checkpoint:
+    """Позиция обработки файла пакетов и накопленные итоги.
+
+    offset - смещение в байтах после последней обработанной строки,
+    fingerprint - отпечаток обработанной части файла (file_fingerprint),
+    totals - итоги по типам тренировок, в файле - Totals.as_dict().
+    """
+
+    offset: int = 0
+    fingerprint: str = ''
+    rows: int = 0
+    processed: int = 0
+    rejected: int = 0
+    totals: Dict[str, Totals] = field(default_factory=dict)
+
+    def save(self, path: str) -> None:
+        """Атомарно сохранить контрольную точку в файл JSON."""
+        data = asdict(self)
+        data['totals'] = {
+            name: totals.as_dict() for name, totals in self.totals.items()
+        }
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Checkpoint':
+        """Загрузить контрольную точку или начать с начала файла."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as file:
+            data = json.load(file)
+        data['totals'] = {
+            name: Totals(**totals, compact_size=TALLY_COMPACT_SIZE)
+            for name, totals in data['totals'].items()
+        }
+        return cls(**data)
+
+
+def file_fingerprint(file: BinaryIO, offset: int) -> str:
+    """Хэш начала файла и FINGERPRINT_SIZE байт перед offset.
+
+    Если файл заменен другим или переписан, отпечаток его первых
+    offset байт не совпадет с сохраненным. Файл остается на позиции
+    offset, если он не короче.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    file.seek(0)
+    digest.update(file.read(min(offset, FINGERPRINT_SIZE)))
+    start = max(0, offset - FINGERPRINT_SIZE)
+    file.seek(start)
+    digest.update(file.read(offset - start))
+    return digest.hexdigest()
+
+
+def resume_checkpoint(path: str, checkpoint_path: str) -> Checkpoint:
+    """Загрузить контрольную точку файла path.
+
+    Если начало файла до сохраненной позиции изменилось (отпечаток не
+    совпал), возвращается новая точка с начала файла.
+    """
+    checkpoint = Checkpoint.load(checkpoint_path)
+    with open(path, 'rb') as file:
+        fingerprint = file_fingerprint(file, checkpoint.offset)
+    if fingerprint != checkpoint.fingerprint:
+        return Checkpoint()
+    return checkpoint
+
+
+def read_complete_lines(file: BinaryIO, count: int) -> List[bytes]:
+    """Прочитать до count строк, не включая недописанную последнюю."""
+    lines = []
+    for _ in range(count):
+        line = file.readline()
+        if not line.endswith(b'\n'):
+            break
+        lines.append(line)
+    return lines
+
+
+def run_checkpointed(
+    path: str,
+    sink: IO,
+    error_sink: TextIO,
+    checkpoint_path: str,
+    every: int = CHECKPOINT_ROWS,
+    chunk_size: int = CHUNK_SIZE,
+    output_format: str = 'text',
+) -> Checkpoint:
+    """Обработать файл пакетов с сохранением контрольных точек.
+
+    Обработка продолжается с позиции из checkpoint_path, поэтому
+    повторный запуск после сбоя или дописывания строк в файл
+    обрабатывает только необработанные строки. Недописанная последняя
+    строка откладывается до следующего запуска, о чем сообщается в
+    error_sink. Если начало файла до сохраненной позиции изменилось
+    (отпечаток не совпал), файл обрабатывается заново.
+    """
+    checkpoint = resume_checkpoint(path, checkpoint_path)
+    saved_rows = checkpoint.rows
+    with open(path, 'rb') as file:
+        file.seek(checkpoint.offset)
+        lines = read_complete_lines(file, chunk_size)
+        while lines:
+            results = tally_messages(
+                compute_batches(check_packages(
+                    parse_packages(csv.reader(map(bytes.decode, lines))),
+                ), chunk_size),
+                checkpoint.totals,
+            )
+            stats = write_results(
+                results, sink, error_sink, chunk_size, output_format,
+            )
+            checkpoint.offset += sum(map(len, lines))
+            checkpoint.rows += len(lines)
+            checkpoint.processed += stats.processed
+            checkpoint.rejected += stats.rejected
+            if checkpoint.rows - saved_rows >= every:
+                save_checkpoint(checkpoint, checkpoint_path, file, sink)
+                saved_rows = checkpoint.rows
+            lines = read_complete_lines(file, chunk_size)
+        deferred = os.fstat(file.fileno()).st_size - checkpoint.offset
+        if deferred > 0:
+            error_sink.write(DEFERRED_MESSAGE.format(path=path, size=deferred))
+        save_checkpoint(checkpoint, checkpoint_path, file, sink)
+    return checkpoint
+
+
+def save_checkpoint(
+    checkpoint: Checkpoint, path: str, file: BinaryIO, sink: IO,
+) -> None:
+    """Сохранить позицию после вывода всех результатов до нее."""
+    sink.flush()
+    checkpoint.fingerprint = file_fingerprint(file, checkpoint.offset)
+    checkpoint.save(path)
@@ -0,0 +1,430 @@
+"""Командная строка: python -m homework [FILE] [параметры].
+
+Модули сервера, пула процессов, двоичного формата, кэша и замеров
+импортируются только в тех режимах, где они нужны, чтобы короткие
+запуски по небольшим файлам не тратили время на их загрузку.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from contextlib import nullcontext
+from functools import partial
+from typing import IO, TYPE_CHECKING, Callable, Optional, Sequence, Tuple
+
+from homework.compression import detect_codec, open_input, open_output
+from homework.formats import OUTPUT_FORMATS
+from homework.pipeline import PipelineStats, run_pipeline
+
+if TYPE_CHECKING:
+    from homework.batching import AdaptiveBatcher
+    from homework.dedup import DedupIndex
+
+Mode = Callable[[argparse.Namespace, IO], PipelineStats]
+CACHE_MESSAGE = 'Кэш: попаданий {}, промахов {}, доля попаданий {:.1%}\n'
+DEDUP_MESSAGE = (
+    'Повторы: {} из {} пакетов ({:.1%}), '
+    'вероятность ложного повтора {:.2g}\n'
+)
+UNKEYED_DEDUP_MESSAGE = (
+    'Повторы: {} из {} пакетов ({:.1%}); без --dedup-key-column '
+    'одинаковые пакеты разных устройств считаются повторами\n'
+)
+BATCHING_MESSAGE = (
+    'Пакеты: {batches} по {mean_batch:.0f} строк в среднем, размер '
+    '{batch_size}, задержка p99 {p99:.1f} мс при цели {slo:.0f} мс, '
+    'превышений {violations}\n'
+)
+COMPRESSED_MESSAGE = '{path}: {option} не поддерживается для сжатых файлов'
+BINARY_MESSAGE = '{path}: {option} не поддерживается для двоичных файлов'
+OPTION_MESSAGE = '{option} не поддерживается вместе с {mode}'
+REQUIRES_MESSAGE = '{option} используется только вместе с {mode}'
+STDIN_MESSAGE = '{option} не поддерживается при чтении из stdin'
+STDIN = '-'
+
+
+def parse_args(argv: Sequence[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Расчет показателей тренировок по пакетам датчиков.',
+    )
+    parser.add_argument(
+        'path', nargs='?', default='packages.csv',
+        help=(
+            'файл с пакетами (по умолчанию packages.csv), '
+            'может быть сжат gzip, bz2, xz или zstd; - для stdin'
+        ),
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH',
+        help=(
+            'сохранить результаты в PATH вместо stdout; расширения '
+            '.gz, .bz2, .xz и .zst включают сжатие'
+        ),
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int, default=1,
+        help='число процессов обработки',
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--pipelined', action='store_true',
+        help=(
+            'читать и записывать в отдельных потоках, пока основной '
+            'поток рассчитывает показатели'
+        ),
+    )
+    mode.add_argument(
+        '--adaptive', action='store_true',
+        help=(
+            'рассчитывать пакеты переменного размера, подбирая размер и '
+            'интервал отправки по цели задержки --latency-slo'
+        ),
+    )
+    parser.add_argument(
+        '--latency-slo', type=float, default=50.0, metavar='MS',
+        help=(
+            'цель задержки строки от чтения до вывода для --adaptive, '
+            'мс (по умолчанию 50)'
+        ),
+    )
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='выводить результаты параллельной обработки по готовности',
+    )
+    parser.add_argument(
+        '-f', '--format', choices=OUTPUT_FORMATS, default='text',
+        dest='output_format', help='формат вывода результатов',
+    )
+    parser.add_argument(
+        '--convert', metavar='OUTPUT',
+        help='сохранить пакеты CSV в двоичный файл OUTPUT и завершиться',
+    )
+    parser.add_argument(
+        '--metrics-out', metavar='PATH',
+        help=(
+            'сохранить замеры этапов в PATH (.prom - Prometheus, иначе '
+            'JSON); не поддерживается с -w, --checkpoint и файлами .trpk'
+        ),
+    )
+    parser.add_argument(
+        '--cache', metavar='PATH',
+        help=(
+            'использовать кэш результатов, сохраняемый в PATH; не '
+            'поддерживается с -w, --checkpoint и файлами .trpk'
+        ),
+    )
+    parser.add_argument(
+        '--dedup', type=float, metavar='SECONDS',
+        help=(
+            'отбрасывать повторы пакетов, пришедшие в течение SECONDS '
+            'секунд после первого'
+        ),
+    )
+    parser.add_argument(
+        '--dedup-bloom', type=int, metavar='CAPACITY',
+        help=(
+            'искать повторы для --dedup в фильтрах Блума на CAPACITY '
+            'ключей вместо точного индекса'
+        ),
+    )
+    parser.add_argument(
+        '--dedup-key-column', type=int, metavar='N',
+        help=(
+            'столбец N (с нуля) с идентификатором устройства: он '
+            'удаляется из пакета и различает пакеты разных устройств '
+            'для --dedup'
+        ),
+    )
+    parser.add_argument(
+        '--checkpoint', metavar='PATH',
+        help=(
+            'сохранять позицию обработки в PATH и продолжать с нее: '
+            'после сбоя или для строк, дописанных с прошлого запуска'
+        ),
+    )
+    parser.add_argument(
+        '--jobs', nargs='+', metavar='PATTERN',
+        help=(
+            'обработать файлы по шаблонам glob или каталогам в пуле из '
+            '--workers процессов, сохранив результаты в --output-dir'
+        ),
+    )
+    parser.add_argument(
+        '--output-dir', default='results', metavar='DIR',
+        help='каталог результатов и сводки для --jobs (по умолчанию results)',
+    )
+    parser.add_argument(
+        '--sketches', action='store_true',
+        help=(
+            'сохранить в сводку --jobs скетчи квантилей скорости и '
+            'калорий по типам тренировок'
+        ),
+    )
+    parser.add_argument(
+        '--serve', metavar='ADDRESS',
+        help=(
+            'работать как демон, принимая пакеты по сети: host:port '
+            'или путь к Unix-сокету (клиент: python -m homework.client)'
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error(f'--workers должно быть не меньше 1: {args.workers}')
+    return args
+
+
+def run_server(address: str) -> PipelineStats:
+    import asyncio
+
+    from homework.server import serve
+
+    asyncio.run(serve(address))
+    return PipelineStats()
+
+
+def run_job(args: argparse.Namespace) -> PipelineStats:
+    from homework.jobs import run_jobs
+
+    try:
+        summary = run_jobs(
+            args.jobs,
+            args.output_dir,
+            args.workers,
+            args.output_format,
+            sys.stderr,
+            args.sketches,
+        )
+    except ValueError as error:
+        sys.exit(str(error))
+    return PipelineStats(summary.processed, summary.rejected)
+
+
+def make_dedup(args: argparse.Namespace) -> 'DedupIndex':
+    from homework.dedup import BloomDedupIndex, DedupIndex
+
+    if args.dedup_bloom:
+        return BloomDedupIndex(
+            args.dedup, args.dedup_bloom, key_column=args.dedup_key_column,
+        )
+    return DedupIndex(args.dedup, key_column=args.dedup_key_column)
+
+
+def report_dedup(dedup: 'DedupIndex') -> None:
+    counts = dedup.duplicates, dedup.checked, dedup.dedup_rate
+    if dedup.key_column is None:
+        sys.stderr.write(UNKEYED_DEDUP_MESSAGE.format(*counts))
+    else:
+        sys.stderr.write(DEDUP_MESSAGE.format(
+            *counts, dedup.false_positive_rate,
+        ))
+
+
+def select_runner(
+    args: argparse.Namespace,
+) -> Tuple[Callable[..., PipelineStats], Optional['AdaptiveBatcher']]:
+    """Функция обработки потока и, для --adaptive, подбор размера пакета."""
+    if args.adaptive:
+        from homework.batching import AdaptiveBatcher, run_adaptive
+        batcher = AdaptiveBatcher(args.latency_slo / 1000)
+        return partial(run_adaptive, batcher=batcher), batcher
+    if args.pipelined:
+        from homework.threaded import run_threaded
+        return run_threaded, None
+    return run_pipeline, None
+
+
+def run_file(args: argparse.Namespace, sink: IO) -> PipelineStats:
+    """Обработать файл CSV конвейером, при необходимости с кэшем и замерами."""
+    instrumentation = cache = dedup = None
+    if args.metrics_out:
+        from homework.instrumentation import Instrumentation
+        instrumentation = Instrumentation()
+    if args.cache:
+        from homework.cache import ResultCache
+        cache = ResultCache.load(args.cache)
+    if args.dedup is not None:
+        dedup = make_dedup(args)
+    run, batcher = select_runner(args)
+    if args.path == STDIN:
+        source = nullcontext(sys.stdin)
+    else:
+        source = open_input(args.path)
+    with source as reader:
+        stats = run(
+            reader,
+            sink,
+            sys.stderr,
+            output_format=args.output_format,
+            instrumentation=instrumentation,
+            cache=cache,
+            dedup=dedup,
+        )
+    if instrumentation is not None:
+        instrumentation.save(args.metrics_out)
+    if cache is not None:
+        cache.save(args.cache)
+        sys.stderr.write(CACHE_MESSAGE.format(
+            cache.hits, cache.misses, cache.hit_rate,
+        ))
+    if dedup is not None:
+        report_dedup(dedup)
+    if batcher is not None:
+        report_batching(batcher)
+    return stats
+
+
+def report_batching(batcher: 'AdaptiveBatcher') -> None:
+    snapshot = batcher.snapshot()
+    sys.stderr.write(BATCHING_MESSAGE.format(
+        p99=snapshot['latency_p99'] * 1000,
+        **{**snapshot, 'slo': batcher.slo * 1000},
+    ))
+
+
+def run_checkpoint(args: argparse.Namespace, sink: IO) -> PipelineStats:
+    from homework.checkpoint import run_checkpointed
+
+    checkpoint = run_checkpointed(
+        args.path,
+        sink,
+        sys.stderr,
+        args.checkpoint,
+        output_format=args.output_format,
+    )
+    return PipelineStats(checkpoint.processed, checkpoint.rejected)
+
+
+def run_workers(args: argparse.Namespace, sink: IO) -> PipelineStats:
+    from homework import parallel
+
+    return parallel.run_parallel(
+        args.path,
+        sink,
+        sys.stderr,
+        args.workers,
+        not args.unordered,
+        output_format=args.output_format,
+    )
+
+
+def run_binary(args: argparse.Namespace, sink: IO) -> PipelineStats:
+    from homework.batch import TrainingBatch, run_batch
+
+    return run_batch(
+        TrainingBatch.load(args.path),
+        sink,
+        output_format=args.output_format,
+    )
+
+
+def open_sink(args: argparse.Namespace) -> IO:
+    """Открыть вывод; при продолжении с контрольной точки - дописывать."""
+    binary = args.output_format == 'binary'
+    if args.output:
+        append = False
+        if args.checkpoint:
+            from homework.checkpoint import resume_checkpoint
+            append = resume_checkpoint(args.path, args.checkpoint).offset > 0
+        return open_output(args.output, binary, append)
+    return sys.stdout.buffer if binary else sys.stdout
+
+
+def refuse_modes(args: argparse.Namespace, message: str) -> None:
+    """Завершить работу, если выбран режим, который не поддерживается."""
+    for enabled, option in (
+        (args.checkpoint, '--checkpoint'),
+        (args.workers > 1, '--workers'),
+    ):
+        if enabled:
+            sys.exit(message.format(path=args.path, option=option))
+
+
+def refuse_options(
+    args: argparse.Namespace,
+    message: str,
+    mode: str = '',
+    extra: Sequence[Tuple[object, str]] = (),
+) -> None:
+    """Завершить работу, если задан параметр только для run_file.
+
+    В extra передаются пары (задан ли, параметр), которые режим mode
+    не поддерживает сверх общих.
+    """
+    for enabled, option in (
+        (args.dedup is not None, '--dedup'),
+        (args.adaptive, '--adaptive'),
+        (args.metrics_out, '--metrics-out'),
+        (args.cache, '--cache'),
+        (args.pipelined, '--pipelined'),
+        *extra,
+    ):
+        if enabled:
+            sys.exit(message.format(path=args.path, option=option, mode=mode))
+
+
+def refuse_orphans(args: argparse.Namespace) -> None:
+    """Завершить работу, если параметр задан без режима, которому нужен."""
+    for enabled, option, mode in (
+        (args.sketches and not args.jobs, '--sketches', '--jobs'),
+        (args.unordered and args.workers == 1, '--unordered', '--workers'),
+        (args.dedup_bloom and args.dedup is None, '--dedup-bloom', '--dedup'),
+        (
+            args.dedup_key_column is not None and args.dedup is None,
+            '--dedup-key-column', '--dedup',
+        ),
+    ):
+        if enabled:
+            sys.exit(REQUIRES_MESSAGE.format(option=option, mode=mode))
+
+
+def select_mode(args: argparse.Namespace) -> Mode:
+    """Режим обработки по параметрам командной строки.
+
+    Неподдерживаемые сочетания параметров отклоняются до открытия
+    вывода, чтобы не затереть файл -o.
+    """
+    if args.path == STDIN:
+        refuse_modes(args, STDIN_MESSAGE)
+        return run_file
+    if detect_codec(args.path) is not None:
+        refuse_modes(args, COMPRESSED_MESSAGE)
+        return run_file
+    from homework.batch import is_batch_file
+    if is_batch_file(args.path):
+        refuse_modes(args, BINARY_MESSAGE)
+        refuse_options(args, BINARY_MESSAGE)
+        return run_binary
+    if args.checkpoint:
+        refuse_options(args, OPTION_MESSAGE, '--checkpoint', (
+            (args.workers > 1, '--workers'),
+        ))
+        return run_checkpoint
+    if args.workers > 1:
+        refuse_options(args, OPTION_MESSAGE, '--workers')
+        return run_workers
+    return run_file
+
+
+def run_cli(argv: Sequence[str] = None) -> PipelineStats:
+    args = parse_args(argv)
+    refuse_orphans(args)
+    if args.serve:
+        return run_server(args.serve)
+    if args.jobs:
+        refuse_options(args, OPTION_MESSAGE, '--jobs', (
+            (args.output, '--output'),
+            (args.unordered, '--unordered'),
+            (args.checkpoint, '--checkpoint'),
+        ))
+        return run_job(args)
+    if args.convert:
+        from homework.batch import convert_to_binary
+        with open_input(args.path) as reader:
+            return convert_to_binary(reader, args.convert, sys.stderr)
+    run = select_mode(args)
+    sink = open_sink(args)
+    try:
+        return run(args, sink)
+    finally:
+        if args.output:
+            sink.close()
@@ -0,0 +1,142 @@
+"""Тонкий клиент демона: python -m homework.client ADDRESS [FILE] [-f F].
+
+Отправляет пакеты из FILE (по умолчанию из stdin) демону, запущенному
+командой python -m homework --serve ADDRESS, и выводит результаты в
+stdout, а сообщения об ошибках - в stderr. Клиент не импортирует
+модули расчета, поэтому время его запуска от них не зависит.
+
+Клиент начинает соединение строкой FORMAT_PREFIX с форматом вывода;
+в ответ на нее демон помечает строки ошибок префиксом ERROR_MARK.
+Соединения без этой строки получают ответы в текстовом формате без
+пометок.
+"""
+from __future__ import annotations
+
+import socket
+import sys
+import threading
+from typing import BinaryIO, Iterable, Optional, Sequence, Tuple
+
+BUFFER_SIZE = 64 * 1024
+USAGE = (
+    'Использование: python -m homework.client ADDRESS [FILE] '
+    '[-f {text,csv,jsonl}]'
+)
+FORMAT_PREFIX = '#format '
+ERROR_MARK = '!'
+CLIENT_FORMATS = ('text', 'csv', 'jsonl')
+
+
+def split_address(address: str) -> Optional[Tuple[str, int]]:
+    """Хост и порт для адреса host:port, None для пути к Unix-сокету."""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return None
+
+
+def connect(address: str) -> socket.socket:
+    host_port = split_address(address)
+    if host_port is not None:
+        return socket.create_connection(host_port)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(address)
+    return client
+
+
+def send_packages(
+    client: socket.socket, source: BinaryIO, output_format: str,
+) -> None:
+    client.sendall(f'{FORMAT_PREFIX}{output_format}\n'.encode())
+    for block in iter(lambda: source.read(BUFFER_SIZE), b''):
+        client.sendall(block)
+    client.shutdown(socket.SHUT_WR)
+
+
+def write_responses(
+    blocks: Iterable[bytes], sink: BinaryIO, error_sink: BinaryIO,
+) -> None:
+    """Разделить ответы демона на результаты и ошибки по ERROR_MARK."""
+    mark = ERROR_MARK.encode()
+    tail = b''
+    for block in blocks:
+        *lines, tail = (tail + block).split(b'\n')
+        results, errors = [], []
+        for line in lines:
+            if line.startswith(mark):
+                errors.append(line[len(mark):] + b'\n')
+            else:
+                results.append(line + b'\n')
+        sink.write(b''.join(results))
+        error_sink.write(b''.join(errors))
+    sink.write(tail)
+
+
+def run_client(
+    address: str,
+    source: BinaryIO,
+    sink: BinaryIO,
+    error_sink: BinaryIO = None,
+    output_format: str = 'text',
+) -> None:
+    """Отправить пакеты демону и записать результаты в sink.
+
+    Сообщения об ошибках пишутся в error_sink (по умолчанию stderr).
+    Отправка идет в отдельном потоке, чтобы демон не ждал, пока клиент
+    освободит место для ответов.
+    """
+    if output_format not in CLIENT_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат вывода {output_format}')
+    if error_sink is None:
+        error_sink = sys.stderr.buffer
+    with connect(address) as client:
+        sender = threading.Thread(
+            target=send_packages,
+            args=(client, source, output_format),
+            daemon=True,
+        )
+        sender.start()
+        write_responses(
+            iter(lambda: client.recv(BUFFER_SIZE), b''), sink, error_sink,
+        )
+        sender.join()
+    sink.flush()
+    error_sink.flush()
+
+
+def parse_args(argv: Sequence[str]) -> Tuple[str, Optional[str], str]:
+    """Адрес, файл пакетов (None - stdin) и формат вывода."""
+    output_format = 'text'
+    positional = []
+    options = iter(argv)
+    for arg in options:
+        if arg in ('-f', '--format'):
+            output_format = next(options, '')
+        elif arg.startswith('--format='):
+            output_format = arg.partition('=')[2]
+        else:
+            positional.append(arg)
+    if not 1 <= len(positional) <= 2 or output_format not in CLIENT_FORMATS:
+        sys.exit(USAGE)
+    address, *paths = positional
+    return address, paths[0] if paths else None, output_format
+
+
+def main(argv: Sequence[str] = None) -> None:
+    address, path, output_format = parse_args(
+        sys.argv[1:] if argv is None else argv,
+    )
+    if path is None:
+        run_client(
+            address, sys.stdin.buffer, sys.stdout.buffer,
+            output_format=output_format,
+        )
+        return
+    with open(path, 'rb') as source:
+        run_client(
+            address, source, sys.stdout.buffer, output_format=output_format,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import io
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from typing import IO, BinaryIO, Callable, Optional, TextIO, Tuple
+
+READ_AHEAD_BYTES = 1 << 20
+READ_AHEAD_BLOCKS = 4
+MAGIC_BYTES = 6
+GZIP_LEVEL = 6
+
+
+class CodecUnavailableError(Exception):
+    """Для формата сжатия не установлен модуль распаковки."""
+
+
+def open_gzip(path: str, mode: str) -> BinaryIO:
+    import gzip
+    return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+
+
+def open_bz2(path: str, mode: str) -> BinaryIO:
+    import bz2
+    return bz2.open(path, mode)
+
+
+def open_xz(path: str, mode: str) -> BinaryIO:
+    import lzma
+    return lzma.open(path, mode)
+
+
+def open_zstd(path: str, mode: str) -> BinaryIO:
+    """Открыть файл zstd модулем compression.zstd или zstandard."""
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            raise CodecUnavailableError(
+                f'{path}: для zstd нужен Python 3.14 или пакет zstandard',
+            ) from None
+    return zstd.open(path, mode)
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    extensions: Tuple[str, ...]
+    magic: bytes
+    open: Callable[[str, str], BinaryIO]
+
+
+CODECS = {
+    codec.name: codec
+    for codec in (
+        Codec('gzip', ('.gz', '.gzip'), b'\x1f\x8b', open_gzip),
+        Codec('bz2', ('.bz2',), b'BZh', open_bz2),
+        Codec('xz', ('.xz', '.lzma'), b'\xfd7zXZ\x00', open_xz),
+        Codec('zstd', ('.zst', '.zstd'), b'\x28\xb5\x2f\xfd', open_zstd),
+    )
+}
+
+
+def detect_codec(path: str, read_magic: bool = True) -> Optional[Codec]:
+    """Определить формат сжатия по первым байтам файла или расширению.
+
+    Первые байты непустого файла важнее расширения: несжатый файл с
+    расширением .gz читается как есть. Для новых и пустых файлов
+    формат определяется по расширению.
+    """
+    if read_magic and os.path.exists(path):
+        with open(path, 'rb') as file:
+            head = file.read(MAGIC_BYTES)
+        for codec in CODECS.values():
+            if head.startswith(codec.magic):
+                return codec
+        if head:
+            return None
+    extension = os.path.splitext(path)[1].lower()
+    for codec in CODECS.values():
+        if extension in codec.extensions:
+            return codec
+    return None
+
+
+class ReadAheadReader(io.RawIOBase):
+    """Поток, который читает source блоками в фоновом потоке.
+
+    Распаковка gzip, bz2 и xz освобождает GIL, поэтому очередной блок
+    распаковывается, пока основной поток разбирает и рассчитывает
+    предыдущие. Очередь ограничена depth блоками, так что память не
+    растет, если расчет медленнее распаковки. Ошибка чтения source
+    передается в основной поток при чтении.
+    """
+
+    def __init__(
+        self,
+        source: BinaryIO,
+        block_size: int = READ_AHEAD_BYTES,
+        depth: int = READ_AHEAD_BLOCKS,
+    ) -> None:
+        super().__init__()
+        self.source = source
+        self.blocks = queue.Queue(depth)
+        self.block = memoryview(b'')
+        self.eof = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.fill, args=(block_size,), daemon=True,
+        )
+        self.thread.start()
+
+    def fill(self, block_size: int) -> None:
+        try:
+            block = self.source.read(block_size)
+            while block and not self.stopped.is_set():
+                self.blocks.put(block)
+                block = self.source.read(block_size)
+            self.blocks.put(b'')
+        except Exception as error:
+            self.blocks.put(error)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self.block:
+            if self.eof:
+                return 0
+            item = self.blocks.get()
+            if isinstance(item, Exception):
+                self.eof = True
+                raise item
+            if not item:
+                self.eof = True
+                return 0
+            self.block = memoryview(item)
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stopped.set()
+            while self.thread.is_alive():
+                try:
+                    self.blocks.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            self.source.close()
+        super().close()
+
+
+def open_input(path: str, read_ahead: bool = None) -> TextIO:
+    """Открыть файл пакетов CSV, распаковывая его при необходимости.
+
+    По умолчанию фоновая распаковка включается, только если процессу
+    доступно больше одного ядра: на одном ядре поток распаковки лишь
+    конкурирует с расчетом.
+    """
+    codec = detect_codec(path)
+    if codec is None:
+        return open(path, newline='')
+    if read_ahead is None:
+        read_ahead = (os.cpu_count() or 1) > 1
+    source = codec.open(path, 'rb')
+    if read_ahead:
+        source = io.BufferedReader(ReadAheadReader(source))
+    return io.TextIOWrapper(source, newline='')
+
+
+def open_output(path: str, binary: bool = False, append: bool = False) -> IO:
+    """Открыть файл результатов, сжимая его по расширению пути.
+
+    С append результаты дописываются в конец файла; сжатые данные
+    дописываются отдельным потоком, что поддерживают все форматы.
+    """
+    mode = 'a' if append else 'w'
+    codec = detect_codec(path, read_magic=False)
+    if codec is None:
+        return open(path, mode + 'b' if binary else mode)
+    target = codec.open(path, mode + 'b')
+    if binary:
+        return target
+    return io.TextIOWrapper(target)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from itertools import tee
+from math import ceil, exp, inf, log
+from time import monotonic
+from typing import (
+    Callable, Hashable, Iterable, Iterator, List, Optional, Tuple, Union,
+)
+
+from homework.pipeline import Package, parse_packages
+from homework.training import InvalidInputDataError
+
+DEDUP_TTL = 300.0
+MAX_KEYS = 1_000_000
+BLOOM_CAPACITY = 10_000_000
+BLOOM_ERROR = 0.001
+
+
+def package_key(package: Package, device_id: str = '') -> Tuple:
+    """Ключ пакета устройства или сессии device_id.
+
+    Ключ строится из разобранных чисел, поэтому повторы с другой
+    записью тех же значений (15000 и 15000.0, пробелы) совпадают.
+    """
+    workout_type, data = package
+    return (device_id, workout_type, *data)
+
+
+class DedupIndex:
+    """Ключи пакетов за последние ttl секунд, не более max_keys.
+
+    Ключи хранятся в словаре в порядке поступления и вытесняются с
+    начала: по истечении ttl с первого появления или при превышении
+    max_keys, поэтому память ограничена (около 200 байт на ключ).
+    Ключи сравниваются целиком, поэтому ложных повторов среди пакетов
+    с известным устройством не бывает; key_column - номер столбца CSV
+    (с нуля) с идентификатором устройства для parse().
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEDUP_TTL,
+        max_keys: int = MAX_KEYS,
+        clock: Callable[[], float] = monotonic,
+        key_column: Optional[int] = None,
+    ) -> None:
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.clock = clock
+        self.key_column = key_column
+        self.keys: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self.expires = inf
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def dedup_rate(self) -> float:
+        """Доля пакетов, отброшенных как повторы."""
+        return self.duplicates / self.checked if self.checked else 0.0
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Вероятность принять новый пакет за повтор."""
+        return 0.0
+
+    def seen(self, key: Hashable) -> bool:
+        """Проверить, был ли ключ в окне, и запомнить его."""
+        self.checked += 1
+        duplicate = self._seen(key, self.clock())
+        self.duplicates += duplicate
+        return duplicate
+
+    def filter(
+        self,
+        packages: Iterable[Union[Package, InvalidInputDataError]],
+        device_id: str = '',
+    ) -> Iterator[Union[Package, InvalidInputDataError]]:
+        """Пропустить пакеты дальше, отбрасывая повторы из окна."""
+        for package in packages:
+            if isinstance(package, InvalidInputDataError) or not self.seen(
+                package_key(package, device_id),
+            ):
+                yield package
+
+    def parse(
+        self, rows: Iterable[List[str]],
+    ) -> Iterator[Union[Package, InvalidInputDataError]]:
+        """Разобрать строки CSV в пакеты, отбрасывая повторы из окна.
+
+        Столбец key_column удаляется из строки и входит в ключ пакета;
+        строки без него отклоняются. Без key_column ключ состоит только
+        из данных, и одинаковые пакеты разных устройств - повторы.
+        """
+        column = self.key_column
+        if column is None:
+            return self.filter(parse_packages(rows))
+        return self._parse_keyed(rows, column)
+
+    def _parse_keyed(
+        self, rows: Iterable[List[str]], column: int,
+    ) -> Iterator[Union[Package, InvalidInputDataError]]:
+        rows, keyed = tee(rows)
+        devices = (row[column] if len(row) > column else None for row in keyed)
+        packages = parse_packages(
+            row[:column] + row[column + 1:] for row in rows
+        )
+        for device_id, package in zip(devices, packages):
+            if device_id is None:
+                yield InvalidInputDataError(f'Нет столбца ключа {column}')
+            elif isinstance(package, InvalidInputDataError) or not self.seen(
+                package_key(package, device_id),
+            ):
+                yield package
+
+    def _seen(self, key: Hashable, now: float) -> bool:
+        keys = self.keys
+        if now >= self.expires:
+            self._expire(now)
+        if key in keys:
+            return True
+        if not keys:
+            self.expires = now + self.ttl
+        keys[key] = now
+        if len(keys) > self.max_keys:
+            keys.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def _expire(self, now: float) -> None:
+        """Вытеснить ключи старше ttl и запомнить срок следующего."""
+        self.expires = inf
+        while self.keys:
+            expires = next(iter(self.keys.values())) + self.ttl
+            if now < expires:
+                self.expires = expires
+                break
+            self.keys.popitem(last=False)
+            self.evicted += 1
+
+
+class BloomFilter:
+    """Множество с ложными срабатываниями в bits битах.
+
+    Для capacity ключей и вероятности ложного срабатывания error
+    нужно -capacity * ln(error) / ln(2) ** 2 бит (1.8 МБ на миллион
+    ключей при error = 0.001); позиции ключа получаются двойным
+    хэшированием из двух 64-битных хэшей.
+    """
+
+    __slots__ = ('size', 'hashes', 'bits', 'count')
+
+    def __init__(self, capacity: int, error: float = BLOOM_ERROR) -> None:
+        self.size = ceil(-capacity * log(error) / log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: Hashable) -> List[int]:
+        """Биты ключа; у фильтров одного размера они совпадают."""
+        first = hash(key)
+        step = hash((key, self.size)) | 1
+        size = self.size
+        return [(first + index * step) % size for index in range(self.hashes)]
+
+    def contains_positions(self, positions: Iterable[int]) -> bool:
+        bits = self.bits
+        for position in positions:
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add_positions(self, positions: Iterable[int]) -> None:
+        bits = self.bits
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.contains_positions(self.positions(key))
+
+    def add(self, key: Hashable) -> None:
+        self.add_positions(self.positions(key))
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Вероятность ложного срабатывания при count добавленных ключах."""
+        return (1 - exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class BloomDedupIndex(DedupIndex):
+    """Индекс повторов для больших окон на двух фильтрах Блума.
+
+    Новые ключи добавляются в текущий фильтр, повтор ищется в текущем
+    и предыдущем. Фильтры сменяются каждые ttl секунд или после
+    capacity ключей, так что ключ помнится от ttl до 2 * ttl (меньше,
+    если за ttl пришло больше capacity ключей). Память постоянна -
+    два фильтра BloomFilter(capacity, error), а вероятность ложного
+    срабатывания не превышает примерно 2 * error; текущая оценка
+    доступна в false_positive_rate.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEDUP_TTL,
+        capacity: int = BLOOM_CAPACITY,
+        error: float = BLOOM_ERROR,
+        clock: Callable[[], float] = monotonic,
+        key_column: Optional[int] = None,
+    ) -> None:
+        super().__init__(ttl, capacity, clock, key_column)
+        self.error = error
+        self.current = BloomFilter(capacity, error)
+        self.previous = BloomFilter(capacity, error)
+        self.started = clock()
+
+    def __len__(self) -> int:
+        return self.current.count + self.previous.count
+
+    @property
+    def false_positive_rate(self) -> float:
+        current = self.current.false_positive_rate
+        previous = self.previous.false_positive_rate
+        return current + previous - current * previous
+
+    def _seen(self, key: Hashable, now: float) -> bool:
+        if (
+            now - self.started >= self.ttl
+            or self.current.count >= self.max_keys
+        ):
+            self.evicted += self.previous.count
+            self.previous = self.current
+            self.current = BloomFilter(self.max_keys, self.error)
+            self.started = now
+        positions = self.current.positions(key)
+        if self.current.contains_positions(
+            positions,
+        ) or self.previous.contains_positions(positions):
+            return True
+        self.current.add_positions(positions)
+        return False
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import csv
+import json
+from io import StringIO
+from operator import attrgetter
+from struct import Struct
+from typing import AnyStr, Callable, Dict, Sequence
+
+from homework.training import (
+    MAX_REGISTERED_TRAININGS, TRAINING_CODES, InfoMessage,
+)
+
+MESSAGE_FIELDS = ('training_type', 'duration', 'distance', 'speed', 'calories')
+BINARY_RECORD = Struct('<B4d')
+UNKNOWN_TRAINING_CODE = MAX_REGISTERED_TRAININGS
+
+
+def format_text(messages: Sequence[InfoMessage]) -> str:
+    """Сообщения о тренировках в текстовом виде, по одному в строке."""
+    return ''.join([message.get_message() + '\n' for message in messages])
+
+
+def format_csv(messages: Sequence[InfoMessage]) -> str:
+    """Показатели тренировок в формате CSV без заголовка."""
+    buffer = StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(
+        map(attrgetter(*MESSAGE_FIELDS), messages),
+    )
+    return buffer.getvalue()
+
+
+def format_jsonl(messages: Sequence[InfoMessage]) -> str:
+    """Показатели тренировок в формате JSON Lines."""
+    return ''.join([
+        json.dumps(
+            dict(zip(MESSAGE_FIELDS, attrgetter(*MESSAGE_FIELDS)(message))),
+            ensure_ascii=False,
+        ) + '\n'
+        for message in messages
+    ])
+
+
+def format_binary(messages: Sequence[InfoMessage]) -> bytes:
+    """Показатели тренировок в виде записей фиксированной длины.
+
+    Запись BINARY_RECORD: код типа тренировки (номер в
+    REGISTERED_TRAININGS) и четыре float64 little-endian - длительность,
+    дистанция, скорость и калории.
+    """
+    pack = BINARY_RECORD.pack
+    return b''.join([
+        pack(
+            TRAINING_CODES.get(message.training_type, UNKNOWN_TRAINING_CODE),
+            message.duration,
+            message.distance,
+            message.speed,
+            message.calories,
+        )
+        for message in messages
+    ])
+
+
+OUTPUT_FORMATS: Dict[str, Callable[[Sequence[InfoMessage]], AnyStr]] = {
+    'text': format_text,
+    'csv': format_csv,
+    'jsonl': format_jsonl,
+    'binary': format_binary,
+}
+
+
+def format_messages(
+    messages: Sequence[InfoMessage], output_format: str = 'text',
+) -> AnyStr:
+    """Сформировать один буфер вывода для группы сообщений."""
+    return OUTPUT_FORMATS[output_format](messages)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from itertools import accumulate
+from time import perf_counter
+from typing import Any, Dict, Iterator
+
+from homework.training import InvalidInputDataError, RejectedPackageError
+
+
+class Histogram:
+    """Гистограмма задержек с накопительными корзинами в секундах."""
+
+    BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'buckets': dict(zip(
+                [*map(str, self.BUCKETS), '+Inf'],
+                accumulate(self.counts),
+            )),
+        }
+
+
+class Instrumentation:
+    """Счетчики и задержки этапов обработки пакетов.
+
+    Передается в run_pipeline(); без него конвейер работает без замеров.
+    Этапы замеряются на блок строк, расчет - на каждую тренировку
+    с разбивкой по типам.
+    """
+
+    STAGES = ('parse', 'check', 'validate', 'compute', 'write')
+
+    def __init__(self) -> None:
+        self.started = perf_counter()
+        self.stages = {stage: Histogram() for stage in self.STAGES}
+        self.trainings: Dict[str, Histogram] = {}
+        self.rows = Counter()
+        self.errors = Counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = perf_counter()
+        yield
+        self.stages.setdefault(name, Histogram()).observe(
+            perf_counter() - start,
+        )
+
+    def observe_training(self, workout_type: str, seconds: float) -> None:
+        self.trainings.setdefault(workout_type, Histogram()).observe(seconds)
+
+    def count_error(self, error: InvalidInputDataError) -> None:
+        if isinstance(error, RejectedPackageError):
+            self.errors[error.reason.value] += 1
+            return
+        cause = error.args[0] if error.args else error
+        if not isinstance(cause, Exception):
+            cause = error
+        self.errors[type(cause).__name__] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = perf_counter() - self.started
+        return {
+            'elapsed_seconds': elapsed,
+            'rows': dict(self.rows),
+            'rows_per_sec': sum(self.rows.values()) / elapsed,
+            'errors': dict(self.errors),
+            'stages': {
+                name: histogram.snapshot()
+                for name, histogram in self.stages.items()
+            },
+            'trainings': {
+                name: histogram.snapshot()
+                for name, histogram in self.trainings.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Снимок в текстовом формате Prometheus."""
+        snapshot = self.snapshot()
+        lines = ['# TYPE homework_rows_total counter']
+        lines += [
+            f'homework_rows_total{{status="{status}"}} {value}'
+            for status, value in snapshot['rows'].items()
+        ]
+        lines.append('# TYPE homework_errors_total counter')
+        lines += [
+            f'homework_errors_total{{cause="{cause}"}} {value}'
+            for cause, value in snapshot['errors'].items()
+        ]
+        lines.append('# TYPE homework_rows_per_second gauge')
+        lines.append(f'homework_rows_per_second {snapshot["rows_per_sec"]}')
+        for metric, label in (('stages', 'stage'), ('trainings', 'type')):
+            name = f'homework_{metric[:-1]}_seconds'
+            lines.append(f'# TYPE {name} histogram')
+            for value, histogram in snapshot[metric].items():
+                for bound, count in histogram['buckets'].items():
+                    lines.append(
+                        f'{name}_bucket{{{label}="{value}",le="{bound}"}} '
+                        f'{count}'
+                    )
+                lines.append(
+                    f'{name}_sum{{{label}="{value}"}} {histogram["sum"]}',
+                )
+                lines.append(
+                    f'{name}_count{{{label}="{value}"}} '
+                    f'{histogram["count"]}'
+                )
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path: str) -> None:
+        """Сохранить снимок: .prom - формат Prometheus, иначе JSON."""
+        with open(path, 'w') as file:
+            if path.endswith('.prom'):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), file, indent=2)
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import csv
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from homework.aggregation import Totals, empty_totals, tally_messages
+from homework.compression import detect_codec, open_input, open_output
+from homework.pipeline import (
+    check_packages, compute_batches, parse_packages, write_results,
+)
+from homework.sketches import TrainingSketches, sketch_messages
+
+SUMMARY_FILE = 'summary.json'
+ERRORS_EXTENSION = '.errors'
+OUTPUT_EXTENSIONS = {
+    'text': '.txt',
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'binary': '.bin',
+}
+SHARD_MESSAGE = '{}: {} строк за {:.3f} с, {:.0f} строк/с\n'
+FAILED_MESSAGE = '{}: ошибка обработки: {}\n'
+SUMMARY_MESSAGE = 'Итого: {} файлов, {} строк за {:.3f} с, {:.0f} строк/с\n'
+
+
+def as_dicts(totals: Dict[str, Totals]) -> Dict[str, dict]:
+    return {name: group.as_dict() for name, group in totals.items()}
+
+
+def sketches_dict(sketches: Optional[TrainingSketches]) -> Optional[dict]:
+    return None if sketches is None else sketches.as_dict()
+
+
+@dataclass
+class ShardResult:
+    """Итоги обработки одного файла пакетов."""
+
+    path: str
+    output: str
+    size: int
+    processed: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    error: str = ''
+    totals: Dict[str, Totals] = field(default_factory=dict)
+    sketches: Optional[TrainingSketches] = None
+
+    @property
+    def rows(self) -> int:
+        return self.processed + self.rejected
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class JobSummary:
+    """Сводка задания: итоги всех файлов и общие итоги по типам."""
+
+    shards: List[ShardResult] = field(default_factory=list)
+    processed: int = 0
+    rejected: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    totals: Dict[str, Totals] = field(default_factory=dict)
+    sketches: Optional[TrainingSketches] = None
+
+    @property
+    def rows(self) -> int:
+        return self.processed + self.rejected
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add(self, shard: ShardResult) -> None:
+        self.shards.append(shard)
+        self.processed += shard.processed
+        self.rejected += shard.rejected
+        self.failed += bool(shard.error)
+        for name, totals in shard.totals.items():
+            self.totals.setdefault(name, empty_totals()).merge(totals)
+        if shard.sketches is not None:
+            if self.sketches is None:
+                self.sketches = TrainingSketches(
+                    shard.sketches.alpha, shard.sketches.precision,
+                )
+            self.sketches.merge(shard.sketches)
+
+    def save(self, path: str) -> None:
+        """Сохранить сводку в JSON вместе со скоростью обработки файлов."""
+        data = asdict(self)
+        data['rows_per_sec'] = self.rows_per_sec
+        data['totals'] = as_dicts(self.totals)
+        data['sketches'] = sketches_dict(self.sketches)
+        for shard, shard_data in zip(self.shards, data['shards']):
+            shard_data['rows_per_sec'] = shard.rows_per_sec
+            shard_data['totals'] = as_dicts(shard.totals)
+            shard_data['sketches'] = sketches_dict(shard.sketches)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(data, file, indent=2)
+        os.replace(temporary, path)
+
+
+def find_shards(patterns: Iterable[str]) -> List[str]:
+    """Найти файлы пакетов по шаблонам glob и путям к каталогам."""
+    shards = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = (
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+            )
+        else:
+            paths = glob.glob(pattern, recursive=True)
+        shards.update(path for path in paths if os.path.isfile(path))
+    return sorted(shards)
+
+
+def shard_output(
+    path: str, base: str, output_dir: str, output_format: str = 'text',
+) -> str:
+    """Путь результатов файла: его путь относительно base в output_dir."""
+    root = os.path.relpath(os.path.abspath(path), base)
+    if detect_codec(path, read_magic=False) is not None:
+        root = os.path.splitext(root)[0]
+    root = os.path.splitext(root)[0]
+    return os.path.join(output_dir, root + OUTPUT_EXTENSIONS[output_format])
+
+
+def shard_outputs(
+    shards: Iterable[str],
+    base: str,
+    output_dir: str,
+    output_format: str = 'text',
+) -> Dict[str, str]:
+    """Пути результатов файлов; совпадение путей двух файлов - ошибка.
+
+    Расширения отбрасываются, поэтому, например, a.csv и a.csv.gz
+    записали бы результаты в один файл.
+    """
+    outputs: Dict[str, str] = {}
+    sources: Dict[str, str] = {}
+    for path in shards:
+        output = outputs[path] = shard_output(
+            path, base, output_dir, output_format,
+        )
+        other = sources.setdefault(os.path.normcase(output), path)
+        if other != path:
+            raise ValueError(
+                f'Результаты файлов {other} и {path} совпадают: {output}',
+            )
+    return outputs
+
+
+def process_shard(
+    path: str,
+    output: str,
+    output_format: str = 'text',
+    sketches: bool = False,
+) -> ShardResult:
+    """Обработать файл пакетов, записав результаты и ошибки рядом.
+
+    С sketches в итоги файла добавляются скетчи показателей по типам.
+    """
+    start = perf_counter()
+    shard = ShardResult(path, output, os.path.getsize(path))
+    if sketches:
+        shard.sketches = TrainingSketches()
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    binary = output_format == 'binary'
+    with open_input(path, read_ahead=False) as reader, \
+            open_output(output, binary) as sink, \
+            open(output + ERRORS_EXTENSION, 'w') as error_sink:
+        results = tally_messages(
+            compute_batches(check_packages(
+                parse_packages(csv.reader(reader)),
+            )),
+            shard.totals,
+        )
+        if shard.sketches is not None:
+            results = sketch_messages(results, shard.sketches)
+        stats = write_results(
+            results,
+            sink,
+            error_sink,
+            output_format=output_format,
+        )
+    shard.processed, shard.rejected = stats.processed, stats.rejected
+    shard.seconds = perf_counter() - start
+    return shard
+
+
+def format_shard(shard: ShardResult) -> str:
+    if shard.error:
+        return FAILED_MESSAGE.format(shard.path, shard.error)
+    return SHARD_MESSAGE.format(
+        shard.path, shard.rows, shard.seconds, shard.rows_per_sec,
+    )
+
+
+def run_jobs(
+    patterns: Iterable[str],
+    output_dir: str,
+    workers: int = None,
+    output_format: str = 'text',
+    report: TextIO = None,
+    sketches: bool = False,
+) -> JobSummary:
+    """Обработать файлы пакетов в пуле процессов.
+
+    Пул выдает следующий файл освободившемуся процессу, а файлы
+    ставятся в очередь от больших к малым, поэтому крупные файлы не
+    остаются в конце и процессы заканчивают работу примерно вместе.
+    Результаты каждого файла сохраняются в output_dir с той же
+    структурой каталогов, сводка - в SUMMARY_FILE; файлы из output_dir
+    не обрабатываются повторно. Ошибка одного файла
+    записывается в его итоги и не останавливает остальные, а если пути
+    результатов двух файлов совпадают, ValueError возникает до начала
+    обработки. Со sketches скетчи файлов сливаются в общие и
+    сохраняются в сводке.
+    """
+    excluded = os.path.join(os.path.abspath(output_dir), '')
+    shards = [
+        path for path in find_shards(patterns)
+        if not os.path.abspath(path).startswith(excluded)
+    ]
+    base = os.path.commonpath(
+        [os.path.dirname(os.path.abspath(path)) for path in shards],
+    ) if shards else os.getcwd()
+    outputs = shard_outputs(shards, base, output_dir, output_format)
+    os.makedirs(output_dir, exist_ok=True)
+    summary = JobSummary()
+    start = perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for path in sorted(shards, key=os.path.getsize, reverse=True):
+            output = outputs[path]
+            future = executor.submit(
+                process_shard, path, output, output_format, sketches,
+            )
+            futures[future] = ShardResult(path, output, os.path.getsize(path))
+        for future in as_completed(futures):
+            try:
+                shard = future.result()
+            except Exception as error:
+                shard = futures[future]
+                shard.error = f'{type(error).__name__}: {error}'
+            summary.add(shard)
+            if report is not None:
+                report.write(format_shard(shard))
+    summary.seconds = perf_counter() - start
+    summary.shards.sort(key=lambda shard: shard.path)
+    summary.save(os.path.join(output_dir, SUMMARY_FILE))
+    if report is not None:
+        report.write(SUMMARY_MESSAGE.format(
+            len(summary.shards),
+            summary.rows,
+            summary.seconds,
+            summary.rows_per_sec,
+        ))
+    return summary
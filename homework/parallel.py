@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait,
+)
+from itertools import islice
+from typing import (
+    IO, Any, AnyStr, Callable, Deque, Iterable, Iterator, List, TextIO, Tuple,
+)
+
+from homework.pipeline import PipelineStats, process_text
+
+CHUNK_BYTES = 8 * 1024 * 1024
+PENDING_PER_WORKER = 2
+
+
+def split_file(
+    path: str, chunk_bytes: int = CHUNK_BYTES,
+) -> List[Tuple[int, int]]:
+    """Разбить файл на диапазоны байтов по границам строк."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as file:
+        while bounds[-1] < size:
+            file.seek(bounds[-1] + chunk_bytes - 1)
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    return list(zip(bounds, bounds[1:]))
+
+
+def process_range(
+    path: str, start: int, end: int, output_format: str = 'text',
+) -> Tuple[AnyStr, str, PipelineStats]:
+    """Обработать диапазон байтов файла с пакетами."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start).decode()
+    return process_text(data, output_format)
+
+
+def iter_bounded(
+    executor: Executor,
+    function: Callable[..., Any],
+    tasks: Iterable[Tuple],
+    limit: int,
+    ordered: bool = True,
+) -> Iterator[Any]:
+    """Результаты function(*task), не более limit задач в пуле сразу.
+
+    Следующая задача отправляется, когда забирается результат одной из
+    отправленных, поэтому в памяти не больше limit результатов.
+    """
+    tasks = iter(tasks)
+    pending: Deque[Future] = deque(
+        executor.submit(function, *task) for task in islice(tasks, limit)
+    )
+    while pending:
+        if ordered:
+            future = pending.popleft()
+        else:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            future = next(iter(done))
+            pending.remove(future)
+        for task in islice(tasks, 1):
+            pending.append(executor.submit(function, *task))
+        yield future.result()
+
+
+def run_parallel(
+    path: str,
+    sink: IO,
+    error_sink: TextIO,
+    workers: int = None,
+    ordered: bool = True,
+    chunk_bytes: int = CHUNK_BYTES,
+    output_format: str = 'text',
+) -> PipelineStats:
+    """Обработать файл с пакетами в пуле процессов.
+
+    При ordered=False результаты выводятся по мере готовности. В пуле
+    одновременно не больше PENDING_PER_WORKER диапазонов на процесс,
+    поэтому память не зависит от размера файла.
+    """
+    stats = PipelineStats()
+    limit = PENDING_PER_WORKER * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(workers) as executor:
+        results = iter_bounded(
+            executor,
+            process_range,
+            (
+                (path, start, end, output_format)
+                for start, end in split_file(path, chunk_bytes)
+            ),
+            limit,
+            ordered,
+        )
+        for output, errors, chunk_stats in results:
+            sink.write(output)
+            error_sink.write(errors)
+            stats.processed += chunk_stats.processed
+            stats.rejected += chunk_stats.rejected
+    return stats
@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from io import BytesIO, StringIO
+from itertools import islice
+from math import isfinite
+from time import perf_counter
+from typing import (
+    IO, TYPE_CHECKING, AnyStr, Dict, Iterable, Iterator, List, Optional,
+    Sequence, TextIO, Tuple, TypeVar, Union,
+)
+
+from homework.formats import format_messages
+from homework.training import (
+    PARAM_LIMITS, TRAINING_REGISTRY, InfoMessage, InvalidInputDataError,
+    RejectedPackageError, RejectReason, Training, compute_batch, read_package,
+)
+
+if TYPE_CHECKING:
+    from homework.cache import ResultCache
+    from homework.dedup import DedupIndex
+    from homework.instrumentation import Instrumentation
+
+CHUNK_SIZE = 1000
+ERROR_MESSAGE = 'Не корректные входные данные {}'
+
+T = TypeVar('T')
+
+
+@dataclass
+class PipelineStats:
+    """Счетчики обработанных и отклоненных пакетов."""
+
+    processed: int = 0
+    rejected: int = 0
+
+
+Package = Tuple[str, List[float]]
+
+
+def parse_packages(
+    rows: Iterable[List[str]],
+) -> Iterator[Union[Package, InvalidInputDataError]]:
+    """Преобразовать строки CSV в пакеты данных."""
+    for row in rows:
+        try:
+            workout, *data = row
+            yield workout, [float(param) for param in data]
+        except ValueError as err:
+            yield InvalidInputDataError(err)
+
+
+def check_value(value: float, name: str) -> Optional[RejectReason]:
+    low, high, positive = PARAM_LIMITS[name]
+    if positive and value <= 0:
+        return RejectReason.NOT_POSITIVE
+    if not low <= value <= high:
+        return RejectReason.OUT_OF_RANGE
+    return None
+
+
+def check_chunk(
+    packages: Sequence[Union[Package, InvalidInputDataError]],
+) -> List[Union[Package, InvalidInputDataError]]:
+    """Проверить блок пакетов по схеме, заменив отклоненные ошибками.
+
+    Параметры проверяются столбцами по типам тренировок: если минимум,
+    максимум и сумма столбца допустимы, построчная проверка не нужна.
+    """
+    results = list(packages)
+    groups: Dict[str, List[int]] = {}
+    for index, package in enumerate(packages):
+        if isinstance(package, InvalidInputDataError):
+            continue
+        workout_type, data = package
+        spec = TRAINING_REGISTRY.get(workout_type)
+        if spec is None:
+            results[index] = RejectedPackageError(
+                RejectReason.UNKNOWN_TYPE, workout_type, data,
+            )
+        elif len(data) != len(spec.params):
+            results[index] = RejectedPackageError(
+                RejectReason.ARITY, workout_type, data,
+            )
+        else:
+            groups.setdefault(workout_type, []).append(index)
+    for workout_type, indices in groups.items():
+        params = TRAINING_REGISTRY[workout_type].params
+        for position, name in enumerate(params):
+            column = [packages[index][1][position] for index in indices]
+            low, high, positive = PARAM_LIMITS[name]
+            smallest = min(column)
+            if (
+                isfinite(sum(column))
+                and low <= smallest
+                and max(column) <= high
+                and (smallest > 0 or not positive)
+            ):
+                continue
+            for index, value in zip(indices, column):
+                reason = check_value(value, name)
+                if reason is not None and not isinstance(
+                    results[index], InvalidInputDataError,
+                ):
+                    results[index] = RejectedPackageError(
+                        reason, *packages[index],
+                    )
+    return results
+
+
+def check_packages(
+    packages: Iterable[Union[Package, InvalidInputDataError]],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Union[Package, InvalidInputDataError]]:
+    """Отклонить пакеты, не прошедшие проверку по схеме."""
+    for chunk in iter_chunks(packages, chunk_size):
+        yield from check_chunk(chunk)
+
+
+def validate_packages(
+    packages: Iterable[Union[Package, InvalidInputDataError]],
+) -> Iterator[Union[Training, InvalidInputDataError]]:
+    """Построить тренировки из пакетов, пропуская ошибки дальше."""
+    for package in packages:
+        if isinstance(package, InvalidInputDataError):
+            yield package
+            continue
+        try:
+            yield read_package(*package)
+        except InvalidInputDataError as err:
+            yield err
+
+
+def compute_messages(
+    trainings: Iterable[Union[Training, InvalidInputDataError]],
+) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+    """Рассчитать показатели тренировок."""
+    for training in trainings:
+        if isinstance(training, InvalidInputDataError):
+            yield training
+        else:
+            yield training.show_training_info()
+
+
+def compute_chunk(
+    packages: Sequence[Union[Package, InvalidInputDataError]],
+) -> List[Union[InfoMessage, InvalidInputDataError]]:
+    """Рассчитать показатели блока проверенных пакетов через compute_batch.
+
+    Если расчет столбцами отклонил блок, пакеты рассчитываются по одному,
+    чтобы ошибка досталась только своей строке.
+    """
+    results: List[Union[InfoMessage, InvalidInputDataError]] = list(packages)
+    indices = [
+        index for index, package in enumerate(packages)
+        if not isinstance(package, InvalidInputDataError)
+    ]
+    valid = [packages[index] for index in indices]
+    width = max((len(data) for _, data in valid), default=0)
+    try:
+        metrics = compute_batch(
+            [workout_type for workout_type, _ in valid],
+            [
+                [data[k] if k < len(data) else 0.0 for _, data in valid]
+                for k in range(width)
+            ],
+        )
+    except InvalidInputDataError:
+        return list(compute_messages(validate_packages(packages)))
+    specs = {
+        workout_type: TRAINING_REGISTRY[workout_type]
+        for workout_type, _ in valid
+    }
+    durations = {
+        workout_type: spec.params.index('duration')
+        for workout_type, spec in specs.items()
+    }
+    for index, (workout_type, data), *values in zip(
+        indices, valid, *metrics,
+    ):
+        results[index] = InfoMessage(
+            specs[workout_type].training.__name__,
+            data[durations[workout_type]],
+            *values,
+        )
+    return results
+
+
+def compute_batches(
+    packages: Iterable[Union[Package, InvalidInputDataError]],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+    """Рассчитать показатели проверенных пакетов блоками столбцов."""
+    for chunk in iter_chunks(packages, chunk_size):
+        yield from compute_chunk(chunk)
+
+
+def iter_chunks(items: Iterable[T], chunk_size: int) -> Iterator[List[T]]:
+    """Разбить поток на списки длиной не более chunk_size."""
+    items = iter(items)
+    chunk = list(islice(items, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, chunk_size))
+
+
+def write_results(
+    results: Iterable[Union[InfoMessage, InvalidInputDataError]],
+    sink: IO,
+    error_sink: TextIO,
+    chunk_size: int = CHUNK_SIZE,
+    output_format: str = 'text',
+) -> PipelineStats:
+    """Записать сообщения и ошибки блоками в соответствующие потоки.
+
+    Для формата binary sink должен быть открыт в двоичном режиме.
+    """
+    stats = PipelineStats()
+    for chunk in iter_chunks(results, chunk_size):
+        messages, errors = [], []
+        for result in chunk:
+            if isinstance(result, InvalidInputDataError):
+                errors.append(ERROR_MESSAGE.format(result))
+            else:
+                messages.append(result)
+        if messages:
+            sink.write(format_messages(messages, output_format))
+        if errors:
+            error_sink.write('\n'.join(errors) + '\n')
+        stats.processed += len(messages)
+        stats.rejected += len(errors)
+    return stats
+
+
+def run_pipeline(
+    source: TextIO,
+    sink: IO,
+    error_sink: TextIO,
+    chunk_size: int = CHUNK_SIZE,
+    output_format: str = 'text',
+    instrumentation: 'Instrumentation' = None,
+    cache: 'ResultCache' = None,
+    dedup: 'DedupIndex' = None,
+) -> PipelineStats:
+    """Обработать поток пакетов CSV за постоянный объем памяти.
+
+    С индексом dedup повторы пакетов отбрасываются до расчета.
+    """
+    if instrumentation is not None:
+        return run_instrumented(
+            csv.reader(source),
+            sink,
+            error_sink,
+            chunk_size,
+            output_format,
+            instrumentation,
+            cache,
+            dedup,
+        )
+    rows = csv.reader(source)
+    if dedup is not None:
+        packages = dedup.parse(rows)
+    else:
+        packages = parse_packages(rows)
+    packages = check_packages(packages, chunk_size)
+    if cache is not None:
+        messages = cache.compute_messages(packages)
+    else:
+        messages = compute_batches(packages, chunk_size)
+    return write_results(
+        messages,
+        sink,
+        error_sink,
+        chunk_size,
+        output_format,
+    )
+
+
+def process_text(
+    data: str,
+    output_format: str = 'text',
+    instrumentation: 'Instrumentation' = None,
+    cache: 'ResultCache' = None,
+    dedup: 'DedupIndex' = None,
+) -> Tuple[AnyStr, str, PipelineStats]:
+    """Обработать текст пакетов CSV, вернув вывод, ошибки и счетчики."""
+    sink = BytesIO() if output_format == 'binary' else StringIO()
+    error_sink = StringIO()
+    stats = run_pipeline(
+        StringIO(data, newline=''),
+        sink,
+        error_sink,
+        output_format=output_format,
+        instrumentation=instrumentation,
+        cache=cache,
+        dedup=dedup,
+    )
+    return sink.getvalue(), error_sink.getvalue(), stats
+
+
+def compute_instrumented(
+    trainings: Iterable[Union[Training, InvalidInputDataError]],
+    instrumentation: 'Instrumentation',
+) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+    """Рассчитать показатели, замеряя время каждой тренировки."""
+    for training in trainings:
+        if isinstance(training, InvalidInputDataError):
+            instrumentation.count_error(training)
+            yield training
+            continue
+        start = perf_counter()
+        message = training.show_training_info()
+        instrumentation.observe_training(
+            message.training_type, perf_counter() - start,
+        )
+        yield message
+
+
+def run_instrumented(
+    rows: Iterable[List[str]],
+    sink: IO,
+    error_sink: TextIO,
+    chunk_size: int,
+    output_format: str,
+    instrumentation: 'Instrumentation',
+    cache: 'ResultCache' = None,
+    dedup: 'DedupIndex' = None,
+) -> PipelineStats:
+    """Обработать пакеты поблочно с замером каждого этапа.
+
+    С кэшем этапы validate и compute замеряются вместе как compute, с
+    индексом повторов этапы parse и dedup - как dedup.
+    """
+    stats = PipelineStats()
+    for chunk in iter_chunks(rows, chunk_size):
+        if dedup is not None:
+            with instrumentation.stage('dedup'):
+                packages = list(dedup.parse(chunk))
+        else:
+            with instrumentation.stage('parse'):
+                packages = list(parse_packages(chunk))
+        with instrumentation.stage('check'):
+            packages = check_chunk(packages)
+        if cache is not None:
+            with instrumentation.stage('compute'):
+                results = list(cache.compute_messages(packages))
+            for result in results:
+                if isinstance(result, InvalidInputDataError):
+                    instrumentation.count_error(result)
+        else:
+            with instrumentation.stage('validate'):
+                trainings = list(validate_packages(packages))
+            with instrumentation.stage('compute'):
+                results = list(
+                    compute_instrumented(trainings, instrumentation),
+                )
+        with instrumentation.stage('write'):
+            chunk_stats = write_results(
+                results, sink, error_sink, chunk_size, output_format,
+            )
+        stats.processed += chunk_stats.processed
+        stats.rejected += chunk_stats.rejected
+    instrumentation.rows['processed'] += stats.processed
+    instrumentation.rows['rejected'] += stats.rejected
+    return stats
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from homework.client import (
+    CLIENT_FORMATS, ERROR_MARK, FORMAT_PREFIX, split_address,
+)
+from homework.formats import format_messages
+from homework.pipeline import (
+    ERROR_MESSAGE, check_packages, compute_messages, parse_packages,
+    validate_packages,
+)
+from homework.training import InvalidInputDataError
+
+READ_SIZE = 64 * 1024
+MAX_LINE_BYTES = 64 * 1024
+LINE_TOO_LONG = 'строка длиннее {} байт'
+UNKNOWN_FORMAT = 'неизвестный формат вывода {}'
+
+
+def decode_lines(lines: Iterable[bytes]) -> Iterator[str]:
+    """Декодировать строки, заменяя неверные байты UTF-8.
+
+    Пакет с замененными байтами отклоняется при разборе, как любой
+    некорректный, и не прерывает обработку остальных строк.
+    """
+    return (line.decode(errors='replace') for line in lines)
+
+
+def read_header(lines: List[bytes]) -> Tuple[Dict[str, str], List[bytes]]:
+    """Параметры process_lines из строки FORMAT_PREFIX и остальные строки.
+
+    Если соединение начинается без этой строки, параметры пусты.
+    """
+    prefix = FORMAT_PREFIX.encode()
+    if not lines[0].startswith(prefix):
+        return {}, lines
+    output_format = lines[0][len(prefix):].decode(errors='replace').strip()
+    if output_format not in CLIENT_FORMATS:
+        raise InvalidInputDataError(UNKNOWN_FORMAT.format(output_format))
+    return {'output_format': output_format, 'mark': ERROR_MARK}, lines[1:]
+
+
+def process_lines(
+    lines: Iterable[str], output_format: str = 'text', mark: str = '',
+) -> str:
+    """Обработать строки пакетов и вернуть ответ на каждую строку.
+
+    Строки ошибок начинаются с mark.
+    """
+    return ''.join([
+        mark + ERROR_MESSAGE.format(result) + '\n'
+        if isinstance(result, InvalidInputDataError)
+        else format_messages([result], output_format)
+        for result in compute_messages(
+            validate_packages(
+                check_packages(parse_packages(csv.reader(lines))),
+            ),
+        )
+    ])
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    read_size: int = READ_SIZE,
+    max_line: int = MAX_LINE_BYTES,
+) -> None:
+    """Принимать пакеты от датчика и отвечать сообщениями о тренировках.
+
+    Пакеты обрабатываются группами: все полные строки, полученные одним
+    чтением. Следующее чтение начинается только после того, как клиент
+    принял ответ, что ограничивает очередь необработанных данных.
+    Строка длиннее max_line байт отклоняется, как только превысит
+    предел, а ее остаток до перевода строки пропускается, поэтому
+    память не зависит от присланных данных. Первая строка FORMAT_PREFIX
+    задает формат вывода и включает пометку ошибок ERROR_MARK; при
+    неизвестном формате соединение закрывается.
+    """
+    try:
+        await answer_packages(reader, writer, read_size, max_line)
+    except InvalidInputDataError as error:
+        writer.write(f'{ERROR_MARK}{ERROR_MESSAGE.format(error)}\n'.encode())
+    finally:
+        writer.close()
+
+
+async def answer_packages(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    read_size: int,
+    max_line: int,
+) -> None:
+    tail = b''
+    skipping = False
+    options = None
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            break
+        if skipping:
+            end = data.find(b'\n')
+            if end < 0:
+                continue
+            skipping = False
+            data = data[end + 1:]
+        *lines, tail = (tail + data).split(b'\n')
+        if options is None and lines:
+            options, lines = read_header(lines)
+        response = process_lines(decode_lines(lines), **options or {})
+        if len(tail) > max_line:
+            tail = b''
+            skipping = True
+            response += (options or {}).get('mark', '') + (
+                ERROR_MESSAGE.format(LINE_TOO_LONG.format(max_line))
+            ) + '\n'
+        if response:
+            writer.write(response.encode())
+            await writer.drain()
+    if tail:
+        response = process_lines(decode_lines([tail]), **options or {})
+        writer.write(response.encode())
+        await writer.drain()
+
+
+async def start_server(address: str) -> asyncio.AbstractServer:
+    """Запустить сервер приема пакетов.
+
+    address - "host:port" для TCP или путь к Unix-сокету.
+    """
+    host_port = split_address(address)
+    if host_port is not None:
+        return await asyncio.start_server(handle_connection, *host_port)
+    return await asyncio.start_unix_server(handle_connection, address)
+
+
+async def serve(address: str) -> None:
+    server = await start_server(address)
+    async with server:
+        await server.serve_forever()
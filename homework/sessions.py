@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from math import fsum, isfinite
+from typing import Any, Dict, Iterator, List, Optional
+
+from homework.pipeline import check_value
+from homework.training import (
+    TRAINING_REGISTRY, InfoMessage, InvalidInputDataError,
+    RejectedPackageError, RejectReason, Training, read_package,
+)
+
+SECONDS_IN_HOUR = 3600
+SECONDS_IN_MINUTE = 60
+SPLIT_KM = 1.0
+MAX_SPLITS = 64
+RECENT_SAMPLES = 60
+MAX_SESSIONS = 100_000
+SAMPLE_PARAMS = ('action', 'duration', 'count_pool')
+LATE_SAMPLE = 'Замер {} раньше предыдущего {}'
+EMPTY_SESSION = 'Сессия {} без замеров'
+
+
+@dataclass
+class Split:
+    """Завершенный отрезок: километр или бассейн для плавания."""
+
+    __slots__ = ('number', 'timestamp', 'seconds', 'distance')
+
+    number: int
+    timestamp: float
+    seconds: float
+    distance: float
+
+    @property
+    def pace(self) -> float:
+        """Темп отрезка, минут на км."""
+        return self.seconds / SECONDS_IN_MINUTE / self.distance
+
+
+class RingBuffer:
+    """Последние capacity элементов в списке постоянной длины."""
+
+    __slots__ = ('items', 'count')
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError(f'Емкость буфера меньше 1: {capacity}')
+        self.items: List[Any] = [None] * capacity
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, len(self.items))
+
+    def __iter__(self) -> Iterator[Any]:
+        """Элементы от самого старого к самому новому."""
+        capacity = len(self.items)
+        for index in range(self.count - len(self), self.count):
+            yield self.items[index % capacity]
+
+    def append(self, item: Any) -> None:
+        self.items[self.count % len(self.items)] = item
+        self.count += 1
+
+    def last(self) -> Optional[Any]:
+        if not self.count:
+            return None
+        return self.items[(self.count - 1) % len(self.items)]
+
+
+class Session:
+    """Тренировка, показатели которой обновляются по мере прихода замеров.
+
+    Для тренировок с параметром count_pool (Swimming) каждый замер - это
+    проплытый бассейн, а count - число гребков за него; для остальных
+    count - число шагов с предыдущего замера. Остальные параметры
+    тренировки (вес, рост, длина бассейна) задаются в params. Последние
+    max_splits отрезков и recent замеров хранятся в кольцевых буферах,
+    поэтому память сессии не зависит от ее длительности. Замеры и
+    итоговые параметры тренировки проверяются по той же схеме
+    PARAM_LIMITS, что и пакеты конвейера.
+    """
+
+    def __init__(
+        self,
+        workout_type: str,
+        start: float,
+        params: Dict[str, float],
+        split_km: float = SPLIT_KM,
+        max_splits: int = MAX_SPLITS,
+        recent: int = RECENT_SAMPLES,
+    ) -> None:
+        if not split_km > 0:
+            raise ValueError(f'Длина отрезка не положительна: {split_km}')
+        try:
+            self.spec = TRAINING_REGISTRY[workout_type]
+        except KeyError as err:
+            raise InvalidInputDataError(err)
+        if not isfinite(start):
+            raise RejectedPackageError(
+                RejectReason.OUT_OF_RANGE, workout_type, [start],
+            )
+        self.params = {
+            name: params.get(name) for name in self.spec.params
+            if name not in SAMPLE_PARAMS
+        }
+        for name, value in self.params.items():
+            reason = (
+                RejectReason.ARITY if value is None
+                else check_value(value, name)
+            )
+            if reason is not None:
+                raise RejectedPackageError(
+                    reason, workout_type, list(self.params.values()),
+                )
+        self.laps_mode = 'count_pool' in self.spec.params
+        self.start = self.timestamp = self.split_start = start
+        self.action = 0
+        self.laps = 0
+        self.distance = 0.0
+        self.split_km = split_km
+        self.split_count = 0
+        self.splits = RingBuffer(max_splits)
+        self.recent = RingBuffer(recent)
+
+    @property
+    def hours(self) -> float:
+        return (self.timestamp - self.start) / SECONDS_IN_HOUR
+
+    @property
+    def current_speed(self) -> float:
+        """Скорость по последним замерам, км/ч."""
+        if not self.recent.count:
+            return 0.0
+        first = next(iter(self.recent))[0]
+        hours = (self.timestamp - first) / SECONDS_IN_HOUR
+        if not hours:
+            return 0.0
+        return fsum(distance for _, _, distance in self.recent) / hours
+
+    def add(self, timestamp: float, count: float) -> List[Split]:
+        """Учесть замер и вернуть отрезки, завершенные этим замером."""
+        if not (isfinite(timestamp) and isfinite(count) and count >= 0):
+            raise RejectedPackageError(
+                RejectReason.OUT_OF_RANGE, self.spec.code, [timestamp, count],
+            )
+        if timestamp < self.timestamp:
+            raise InvalidInputDataError(
+                LATE_SAMPLE.format(timestamp, self.timestamp),
+            )
+        previous, self.timestamp = self.timestamp, timestamp
+        self.action += count
+        if self.laps_mode:
+            self.laps += 1
+            distance = self.params['length_pool'] / Training.M_IN_KM
+            splits = [self._split(timestamp, distance)]
+        else:
+            distance = (
+                count * self.spec.training.LEN_STEP / Training.M_IN_KM
+            )
+            splits = self._cross(previous, timestamp, distance)
+        self.distance += distance
+        self.recent.append((previous, timestamp, distance))
+        return splits
+
+    def _cross(
+        self, previous: float, timestamp: float, distance: float,
+    ) -> List[Split]:
+        """Отрезки, границы которых пройдены за замер.
+
+        Момент пересечения границы считается по равномерному движению
+        внутри интервала замера.
+        """
+        splits = []
+        boundary = (self.split_count + 1) * self.split_km
+        while distance and self.distance + distance >= boundary:
+            share = (boundary - self.distance) / distance
+            crossed = previous + (timestamp - previous) * share
+            splits.append(self._split(crossed, self.split_km))
+            boundary = (self.split_count + 1) * self.split_km
+        return splits
+
+    def _split(self, timestamp: float, distance: float) -> Split:
+        self.split_count += 1
+        split = Split(
+            self.split_count, timestamp, timestamp - self.split_start,
+            distance,
+        )
+        self.split_start = timestamp
+        self.splits.append(split)
+        return split
+
+    def training(self) -> Training:
+        """Тренировка с накопленными на текущий момент данными.
+
+        Если накопленные значения выходят за границы PARAM_LIMITS
+        (например, сессия дольше суток), возникает RejectedPackageError.
+        """
+        if not self.hours:
+            raise InvalidInputDataError(EMPTY_SESSION.format(self.spec.code))
+        values = {
+            'action': self.action,
+            'duration': self.hours,
+            'count_pool': self.laps,
+            **self.params,
+        }
+        data = [values[name] for name in self.spec.params]
+        for name, value in zip(self.spec.params, data):
+            reason = check_value(value, name)
+            if reason is not None:
+                raise RejectedPackageError(reason, self.spec.code, data)
+        return read_package(self.spec.code, data)
+
+    def show_training_info(self) -> InfoMessage:
+        return self.training().show_training_info()
+
+
+class SessionTracker:
+    """Активные сессии тренировок, не более max_sessions.
+
+    При превышении лимита дольше всех не обновлявшиеся сессии
+    вытесняются первыми.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, **options) -> None:
+        self.max_sessions = max_sessions
+        self.options = options
+        self.sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def open(
+        self, session_id: str, workout_type: str, start: float, **params,
+    ) -> Session:
+        session = Session(workout_type, start, params, **self.options)
+        self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evicted += 1
+        return session
+
+    def add(
+        self, session_id: str, timestamp: float, count: float,
+    ) -> List[Split]:
+        """Учесть замер сессии session_id и вернуть завершенные отрезки."""
+        try:
+            session = self.sessions[session_id]
+        except KeyError as err:
+            raise InvalidInputDataError(err)
+        self.sessions.move_to_end(session_id)
+        return session.add(timestamp, count)
+
+    def close(self, session_id: str) -> InfoMessage:
+        """Завершить сессию и вернуть ее итоговое сообщение."""
+        try:
+            session = self.sessions.pop(session_id)
+        except KeyError as err:
+            raise InvalidInputDataError(err)
+        return session.show_training_info()
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from math import ceil, inf, log, nan
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from homework.training import InfoMessage, InvalidInputDataError
+
+RELATIVE_ACCURACY = 0.01
+MAX_BINS = 2048
+HLL_PRECISION = 14
+SKETCH_METRICS = ('speed', 'calories')
+
+
+class QuantileSketch:
+    """Квантили потока чисел с относительной погрешностью alpha (DDSketch).
+
+    Значение x попадает в корзину ceil(log(|x|) / log(gamma)), где
+    gamma = (1 + alpha) / (1 - alpha), и оценка любого квантиля
+    отличается от точного значения того же ранга не более чем в
+    (1 +- alpha) раз. Погрешность не зависит от числа значений и
+    распределения, а скетчи с одинаковыми alpha сливаются сложением
+    счетчиков корзин без потери точности, поэтому результат не зависит
+    от разбиения потока между процессами и файлами.
+
+    Память - не более max_bins корзин на знак: с alpha = 0.01 это
+    диапазон значений в e^80 раз. При переполнении сливаются корзины
+    самых малых по модулю значений, и гарантия остается для квантилей
+    выше них.
+    """
+
+    __slots__ = (
+        'alpha', 'max_bins', 'gamma', 'multiplier', 'count', 'zero', 'min',
+        'max', 'positive', 'negative',
+    )
+
+    def __init__(
+        self, alpha: float = RELATIVE_ACCURACY, max_bins: int = MAX_BINS,
+    ) -> None:
+        if not 0 < alpha < 1:
+            raise ValueError(f'Точность alpha вне (0, 1): {alpha}')
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.multiplier = 1 / log(self.gamma)
+        self.count = 0
+        self.zero = 0
+        self.min = inf
+        self.max = -inf
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        """Число корзин - память скетча."""
+        return len(self.positive) + len(self.negative)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value > 0:
+            bins = self.positive
+        elif value < 0:
+            bins = self.negative
+        else:
+            bins = None
+            self.zero += count
+        if bins is not None:
+            key = ceil(log(abs(value)) * self.multiplier)
+            bins[key] = bins.get(key, 0) + count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.count += count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _collapse(self, bins: Dict[int, int]) -> None:
+        """Слить корзины самых малых по модулю значений в одну."""
+        keys = sorted(bins)
+        target = keys[len(keys) - self.max_bins]
+        for key in keys[:len(keys) - self.max_bins]:
+            bins[target] += bins.pop(key)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        if other.alpha != self.alpha:
+            raise ValueError(
+                f'Нельзя слить скетчи с точностью {self.alpha} '
+                f'и {other.alpha}',
+            )
+        for bins, other_bins in (
+            (self.positive, other.positive), (self.negative, other.negative),
+        ):
+            for key, count in other_bins.items():
+                bins[key] = bins.get(key, 0) + count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.count += other.count
+        self.zero += other.zero
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Оценка q-квантиля, 0 <= q <= 1; для пустого скетча - nan."""
+        if not 0 <= q <= 1:
+            raise ValueError(f'Квантиль вне [0, 1]: {q}')
+        if not self.count:
+            return nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, object]:
+        """Скетч для JSON, загружается from_dict."""
+        return {
+            'alpha': self.alpha,
+            'max_bins': self.max_bins,
+            'count': self.count,
+            'zero': self.zero,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'positive': sorted(self.positive.items()),
+            'negative': sorted(self.negative.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'QuantileSketch':
+        sketch = cls(data['alpha'], data['max_bins'])
+        sketch.count = data['count']
+        sketch.zero = data['zero']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        sketch.positive = {key: count for key, count in data['positive']}
+        sketch.negative = {key: count for key, count in data['negative']}
+        return sketch
+
+
+class HyperLogLog:
+    """Оценка числа различных ключей в 2 ** precision байтах.
+
+    Стандартная относительная погрешность - 1.04 / sqrt(2 ** precision):
+    0.81% для precision = 14 (16 КБ); для малых чисел ключей оценка
+    уточняется линейным подсчетом. Слияние - поэлементный максимум
+    регистров, поэтому скетчи процессов и файлов сливаются без потерь,
+    а ключ, встреченный в нескольких из них, учитывается один раз.
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = HLL_PRECISION) -> None:
+        if not 4 <= precision <= 18:
+            raise ValueError(f'Точность вне [4, 18]: {precision}')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key: str) -> None:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        if other.precision != self.precision:
+            raise ValueError(
+                f'Нельзя слить счетчики с точностью {self.precision} '
+                f'и {other.precision}',
+            )
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @property
+    def error(self) -> float:
+        """Стандартная относительная погрешность оценки."""
+        return 1.04 / len(self.registers) ** 0.5
+
+    def estimate(self) -> float:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(
+            2.0 ** -rank for rank in self.registers
+        )
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            return size * log(size / zeros)
+        return estimate
+
+    def __len__(self) -> int:
+        return round(self.estimate())
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'precision': self.precision,
+            'registers': base64.b64encode(self.registers).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'HyperLogLog':
+        counter = cls(data['precision'])
+        counter.registers = bytearray(base64.b64decode(data['registers']))
+        return counter
+
+
+class TrainingSketches:
+    """Скетчи показателей SKETCH_METRICS и пользователей по типам тренировок.
+
+    Память не зависит от числа тренировок: для каждого типа - скетчи
+    квантилей метрик и, если переданы пользователи, HyperLogLog.
+    """
+
+    def __init__(
+        self,
+        alpha: float = RELATIVE_ACCURACY,
+        precision: int = HLL_PRECISION,
+    ) -> None:
+        self.alpha = alpha
+        self.precision = precision
+        self.metrics: Dict[str, Dict[str, QuantileSketch]] = {}
+        self.users: Dict[str, HyperLogLog] = {}
+
+    def _metrics(self, training_type: str) -> Dict[str, QuantileSketch]:
+        metrics = self.metrics.get(training_type)
+        if metrics is None:
+            metrics = self.metrics[training_type] = {
+                metric: QuantileSketch(self.alpha) for metric in SKETCH_METRICS
+            }
+        return metrics
+
+    def _users(self, training_type: str) -> HyperLogLog:
+        users = self.users.get(training_type)
+        if users is None:
+            users = self.users[training_type] = HyperLogLog(self.precision)
+        return users
+
+    def add(self, message: InfoMessage, user_id: str = None) -> None:
+        for metric, sketch in self._metrics(message.training_type).items():
+            sketch.add(getattr(message, metric))
+        if user_id is not None:
+            self._users(message.training_type).add(user_id)
+
+    def merge(self, other: 'TrainingSketches') -> None:
+        for training_type, metrics in other.metrics.items():
+            own = self._metrics(training_type)
+            for metric, sketch in metrics.items():
+                own[metric].merge(sketch)
+        for training_type, users in other.users.items():
+            self._users(training_type).merge(users)
+
+    def quantile(self, training_type: str, metric: str, q: float) -> float:
+        """Оценка q-квантиля метрики для типа; nan, если тренировок нет."""
+        if metric not in SKETCH_METRICS:
+            raise ValueError(f'Неизвестная метрика {metric}')
+        metrics = self.metrics.get(training_type)
+        return metrics[metric].quantile(q) if metrics else nan
+
+    def distinct_users(self, training_type: str) -> int:
+        users = self.users.get(training_type)
+        return len(users) if users else 0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'alpha': self.alpha,
+            'precision': self.precision,
+            'metrics': {
+                training_type: {
+                    metric: sketch.as_dict()
+                    for metric, sketch in metrics.items()
+                }
+                for training_type, metrics in self.metrics.items()
+            },
+            'users': {
+                training_type: users.as_dict()
+                for training_type, users in self.users.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'TrainingSketches':
+        sketches = cls(data['alpha'], data['precision'])
+        sketches.metrics = {
+            training_type: {
+                metric: QuantileSketch.from_dict(sketch)
+                for metric, sketch in metrics.items()
+            }
+            for training_type, metrics in data['metrics'].items()
+        }
+        sketches.users = {
+            training_type: HyperLogLog.from_dict(users)
+            for training_type, users in data['users'].items()
+        }
+        return sketches
+
+
+def sketch_messages(
+    results: Iterable[Union[InfoMessage, InvalidInputDataError]],
+    sketches: TrainingSketches,
+    user_id: Optional[str] = None,
+) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+    """Пропустить результаты дальше, добавляя сообщения в скетчи."""
+    for result in results:
+        if isinstance(result, InfoMessage):
+            sketches.add(result, user_id)
+        yield result
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import heapq
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from math import inf
+from typing import (
+    Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple,
+    Union,
+)
+
+from homework.aggregation import Totals, empty_totals
+from homework.pipeline import iter_chunks
+from homework.training import InfoMessage, InvalidInputDataError
+
+STORE_BATCH = 50_000
+LEADERS_SIZE = 1000
+METRICS = ('duration', 'distance', 'speed', 'calories')
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',
+)
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    training_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    duration REAL NOT NULL,
+    distance REAL NOT NULL,
+    speed REAL NOT NULL,
+    calories REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaders (
+    metric TEXT NOT NULL,
+    training_type TEXT NOT NULL,
+    value REAL NOT NULL,
+    result_id INTEGER NOT NULL,
+    PRIMARY KEY (metric, training_type, value, result_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS type_days (
+    training_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    trainings INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    distance REAL NOT NULL,
+    calories REAL NOT NULL,
+    partials TEXT NOT NULL,
+    PRIMARY KEY (training_type, day)
+) WITHOUT ROWID;
+'''
+USER_INDEX = (
+    'CREATE INDEX IF NOT EXISTS results_user_day ON results (user_id, day)'
+)
+INSERT_RESULT = '''
+INSERT INTO results (
+    user_id, training_type, day, duration, distance, speed, calories
+) VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_LEADER = 'INSERT OR IGNORE INTO leaders VALUES (?, ?, ?, ?)'
+SELECT_THRESHOLD = '''
+SELECT value FROM leaders WHERE metric = ? AND training_type = ?
+ORDER BY value DESC LIMIT 1 OFFSET ?
+'''
+PRUNE_LEADERS = '''
+DELETE FROM leaders WHERE metric = ? AND training_type = ? AND value < ?
+'''
+SELECT_THRESHOLDS = '''
+SELECT metric, training_type, MIN(value) FROM leaders
+GROUP BY metric, training_type HAVING COUNT(*) >= ?
+'''
+SELECT_TYPE_DAY = '''
+SELECT trainings, partials FROM type_days
+WHERE training_type = ? AND day = ?
+'''
+REPLACE_TYPE_DAY = '''
+INSERT OR REPLACE INTO type_days VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+RESULT_COLUMNS = ', '.join(
+    f'results.{name}' for name in (
+        'user_id', 'training_type', 'day', 'duration', 'distance', 'speed',
+        'calories',
+    )
+)
+SELECT_LEADERS = '''
+SELECT {columns} FROM leaders JOIN results ON results.id = result_id
+WHERE {condition} ORDER BY value DESC LIMIT ?
+'''
+SELECT_TOP = '''
+SELECT {columns} FROM results WHERE {condition}
+ORDER BY {metric} DESC LIMIT ?
+'''
+SELECT_TOTALS = '''
+SELECT training_type, trainings, partials FROM type_days WHERE {condition}
+'''
+SELECT_USER_TOTALS = '''
+SELECT training_type, duration, distance, calories
+FROM results WHERE user_id = ? AND {condition}
+'''
+
+ResultRow = Tuple[str, str, str, float, float, float, float]
+
+
+@dataclass
+class StoredResult:
+    """Сохраненный результат тренировки пользователя за день."""
+
+    __slots__ = (
+        'user_id', 'training_type', 'day', 'duration', 'distance', 'speed',
+        'calories',
+    )
+
+    user_id: str
+    training_type: str
+    day: str
+    duration: float
+    distance: float
+    speed: float
+    calories: float
+
+
+def day_key(day: date = None) -> str:
+    return (day or date.today()).isoformat()
+
+
+def group_totals(
+    rows: Iterable[Tuple[Hashable, float, float, float]],
+) -> Dict[Hashable, Totals]:
+    """Итоги строк (ключ, длительность, дистанция, калории) по ключам."""
+    groups: Dict[Hashable, Totals] = {}
+    for key, duration, distance, calories in rows:
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = empty_totals()
+        totals.trainings += 1
+        durations, distances, spent = totals.columns
+        durations.append(duration)
+        distances.append(distance)
+        spent.append(calories)
+    return groups
+
+
+class ResultStore:
+    """Результаты тренировок в локальной базе SQLite.
+
+    Строки добавляются блоками по STORE_BATCH в одной транзакции
+    подготовленными запросами. В тех же транзакциях обновляются
+    дневные итоги типов тренировок и таблица LEADERS_SIZE лучших
+    результатов по каждой метрике и типу, поэтому общие итоги и лучшие
+    результаты не требуют просмотра таблицы результатов. У нее только
+    индекс (пользователь, день) для запросов по пользователю: каждый
+    вторичный индекс замедляет вставку более чем вдвое. Дневные итоги
+    хранят точные частичные суммы Totals (столбец partials, JSON), а
+    итоги складываются в Python, поэтому суммы правильно округлены, как
+    у Totals; столбцы duration, distance и calories - их округленные
+    значения для запросов SQL.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        for pragma in PRAGMAS:
+            self.connection.execute(pragma)
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(USER_INDEX)
+        self.thresholds: Optional[Dict[str, Dict[str, float]]] = None
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def insert_rows(self, rows: Iterable[ResultRow]) -> int:
+        """Добавить строки (пользователь, тип, день, показатели)."""
+        count = 0
+        for chunk in iter_chunks(rows, STORE_BATCH):
+            with self.connection:
+                (last_id,) = self.connection.execute(
+                    'SELECT COALESCE(MAX(id), 0) FROM results',
+                ).fetchone()
+                self.connection.executemany(INSERT_RESULT, chunk)
+                self._update_leaders(chunk, last_id + 1)
+                self._update_totals(chunk)
+            count += len(chunk)
+        return count
+
+    def _update_leaders(
+        self, rows: Sequence[ResultRow], first_id: int,
+    ) -> None:
+        """Добавить в таблицу лидеров строки, которые лучше порога.
+
+        Порог типа и метрики - значение LEADERS_SIZE-го лидера; пока
+        лидеров меньше, порога нет. Пороги хранятся в памяти, поэтому
+        после первых блоков почти все строки отсеиваются одним
+        сравнением, а лишние лидеры удаляются по первичному ключу.
+        """
+        if self.thresholds is None:
+            self.thresholds = {metric: {} for metric in METRICS}
+            for metric, training_type, value in self.connection.execute(
+                SELECT_THRESHOLDS, (LEADERS_SIZE,),
+            ):
+                self.thresholds[metric][training_type] = value
+        training_types = {row[1] for row in rows}
+        for position, metric in enumerate(METRICS, 3):
+            limits = self.thresholds[metric]
+            floor = min(limits.get(name, -inf) for name in training_types)
+            groups: Dict[str, List[Tuple[float, int]]] = {}
+            for number, row in (
+                (number, row) for number, row in enumerate(rows, first_id)
+                if row[position] >= floor
+            ):
+                if row[position] >= limits.get(row[1], -inf):
+                    groups.setdefault(row[1], []).append(
+                        (row[position], number),
+                    )
+            for training_type, candidates in groups.items():
+                self._add_leaders(
+                    metric, training_type,
+                    heapq.nlargest(LEADERS_SIZE, candidates),
+                )
+
+    def _add_leaders(
+        self,
+        metric: str,
+        training_type: str,
+        leaders: Iterable[Tuple[float, int]],
+    ) -> None:
+        self.connection.executemany(INSERT_LEADER, (
+            (metric, training_type, value, result_id)
+            for value, result_id in leaders
+        ))
+        threshold = self.connection.execute(
+            SELECT_THRESHOLD, (metric, training_type, LEADERS_SIZE - 1),
+        ).fetchone()
+        if threshold is not None:
+            self.connection.execute(
+                PRUNE_LEADERS, (metric, training_type, *threshold),
+            )
+            self.thresholds[metric][training_type] = threshold[0]
+
+    def _update_totals(self, rows: Sequence[ResultRow]) -> None:
+        """Прибавить строки к дневным итогам типов тренировок."""
+        type_days = group_totals(
+            ((row[1], row[2]), row[3], row[4], row[6]) for row in rows
+        )
+        for key, totals in type_days.items():
+            saved = self.connection.execute(SELECT_TYPE_DAY, key).fetchone()
+            if saved is not None:
+                totals.merge(Totals(saved[0], partials=json.loads(saved[1])))
+            else:
+                totals.compact()
+            self.connection.execute(REPLACE_TYPE_DAY, (
+                *key, totals.trainings, totals.duration, totals.distance,
+                totals.calories, json.dumps(totals.columns),
+            ))
+
+    @contextmanager
+    def bulk_load(self) -> Iterator['ResultStore']:
+        """Загрузка без индекса пользователей с его построением в конце.
+
+        Построение индекса по всей таблице быстрее, чем его обновление
+        при каждой вставке, если загружаемых строк не меньше, чем уже
+        сохраненных.
+        """
+        self.connection.execute('DROP INDEX IF EXISTS results_user_day')
+        try:
+            yield self
+        finally:
+            self.connection.execute(USER_INDEX)
+
+    def insert(
+        self,
+        messages: Iterable[InfoMessage],
+        user_id: str = '',
+        day: date = None,
+    ) -> int:
+        """Добавить сообщения тренировок пользователя за день."""
+        key = day_key(day)
+        return self.insert_rows(
+            (
+                user_id, message.training_type, key, message.duration,
+                message.distance, message.speed, message.calories,
+            )
+            for message in messages
+        )
+
+    def record(
+        self,
+        results: Iterable[Union[InfoMessage, InvalidInputDataError]],
+        user_id: str = '',
+        day: date = None,
+    ) -> Iterator[Union[InfoMessage, InvalidInputDataError]]:
+        """Пропустить результаты дальше, сохраняя сообщения блоками."""
+        pending = []
+        for result in results:
+            if isinstance(result, InfoMessage):
+                pending.append(result)
+                if len(pending) >= STORE_BATCH:
+                    self.insert(pending, user_id, day)
+                    pending = []
+            yield result
+        self.insert(pending, user_id, day)
+
+    def top(
+        self, metric: str, count: int = 10, training_type: str = None,
+    ) -> List[StoredResult]:
+        """Лучшие count результатов по метрике.
+
+        До LEADERS_SIZE результатов читаются из таблицы лидеров, больше -
+        полным просмотром результатов.
+        """
+        if metric not in METRICS:
+            raise ValueError(f'Неизвестная метрика {metric}')
+        conditions, params = [], []
+        if count <= LEADERS_SIZE:
+            query = SELECT_LEADERS
+            conditions.append('metric = ?')
+            params.append(metric)
+            if training_type is not None:
+                conditions.append('leaders.training_type = ?')
+                params.append(training_type)
+        else:
+            query = SELECT_TOP
+            if training_type is not None:
+                conditions.append('training_type = ?')
+                params.append(training_type)
+        query = query.format(
+            columns=RESULT_COLUMNS,
+            condition=' AND '.join(conditions) or '1',
+            metric=metric,
+        )
+        return [
+            StoredResult(*row)
+            for row in self.connection.execute(query, (*params, count))
+        ]
+
+    def totals(
+        self,
+        user_id: str = None,
+        since: date = None,
+        until: date = None,
+    ) -> Dict[str, Totals]:
+        """Итоги по типам тренировок за дни с since по until включительно.
+
+        Без user_id итоги всех пользователей читаются из дневных итогов
+        типов, для пользователя - из его строк по индексу.
+        """
+        conditions, params = ['1'], []
+        if since is not None:
+            conditions.append('day >= ?')
+            params.append(since.isoformat())
+        if until is not None:
+            conditions.append('day <= ?')
+            params.append(until.isoformat())
+        condition = ' AND '.join(conditions)
+        if user_id is not None:
+            totals = group_totals(self.connection.execute(
+                SELECT_USER_TOTALS.format(condition=condition),
+                (user_id, *params),
+            ))
+            for group in totals.values():
+                group.compact()
+            return totals
+        totals: Dict[str, Totals] = {}
+        for training_type, trainings, partials in self.connection.execute(
+            SELECT_TOTALS.format(condition=condition), params,
+        ):
+            totals.setdefault(training_type, empty_totals()).merge(
+                Totals(trainings, partials=json.loads(partials)),
+            )
+        return totals
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import (
+    IO, TYPE_CHECKING, AnyStr, Iterable, Iterator, List, TextIO, Tuple,
+)
+
+from homework.pipeline import PipelineStats, process_text
+
+if TYPE_CHECKING:
+    from homework.cache import ResultCache
+    from homework.dedup import DedupIndex
+    from homework.instrumentation import Instrumentation
+
+BLOCK_CHARS = 256 * 1024
+QUEUE_DEPTH = 4
+STOP = object()
+
+
+def read_blocks(
+    source: TextIO, block_size: int = BLOCK_CHARS,
+) -> Iterator[str]:
+    """Читать поток блоками, заканчивающимися на границе строки."""
+    rest = ''
+    block = source.read(block_size)
+    while block:
+        block = rest + block
+        end = block.rfind('\n') + 1
+        if end:
+            yield block[:end]
+        rest = block[end:]
+        block = source.read(block_size)
+    if rest:
+        yield rest
+
+
+def feed(
+    items: Iterable, target: queue.Queue, stopped: threading.Event,
+) -> None:
+    """Передавать элементы в очередь до конца items или остановки.
+
+    Ошибка чтения items передается в очередь вместо очередного элемента.
+    """
+    try:
+        for item in items:
+            if stopped.is_set():
+                return
+            target.put(item)
+    except Exception as error:
+        target.put(error)
+        return
+    target.put(STOP)
+
+
+def iter_queue(source: queue.Queue) -> Iterator:
+    """Выдавать элементы очереди до STOP, поднимая переданные ошибки."""
+    item = source.get()
+    while item is not STOP:
+        if isinstance(item, Exception):
+            raise item
+        yield item
+        item = source.get()
+
+
+def write_outputs(
+    outputs: queue.Queue,
+    sink: IO,
+    error_sink: TextIO,
+    failures: List[Exception],
+) -> None:
+    """Записывать результаты из очереди до STOP.
+
+    После ошибки записи очередь продолжает освобождаться, чтобы этап
+    расчета не блокировался, а ошибка сохраняется в failures.
+    """
+    for output, errors in iter_queue(outputs):
+        if failures:
+            continue
+        try:
+            if output:
+                sink.write(output)
+            if errors:
+                error_sink.write(errors)
+        except Exception as error:
+            failures.append(error)
+
+
+def start_thread(target, *args) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_threaded(
+    source: TextIO,
+    sink: IO,
+    error_sink: TextIO,
+    output_format: str = 'text',
+    instrumentation: 'Instrumentation' = None,
+    cache: 'ResultCache' = None,
+    block_size: int = BLOCK_CHARS,
+    depth: int = QUEUE_DEPTH,
+    dedup: 'DedupIndex' = None,
+) -> PipelineStats:
+    """Обработать поток пакетов, совмещая чтение и запись с расчетом.
+
+    Поток чтения заполняет очередь блоками строк, основной поток
+    рассчитывает блоки, а поток записи выводит готовые результаты.
+    Очереди ограничены depth блоками: медленный диск приостанавливает
+    расчет, а медленный расчет - чтение, и данные не накапливаются.
+    """
+    blocks: queue.Queue[str] = queue.Queue(depth)
+    outputs: queue.Queue[Tuple[AnyStr, str]] = queue.Queue(depth)
+    stopped = threading.Event()
+    failures: List[Exception] = []
+    reader = start_thread(
+        feed, read_blocks(source, block_size), blocks, stopped,
+    )
+    writer = start_thread(write_outputs, outputs, sink, error_sink, failures)
+    stats = PipelineStats()
+    try:
+        for block in iter_queue(blocks):
+            output, errors, block_stats = process_text(
+                block, output_format, instrumentation, cache, dedup,
+            )
+            outputs.put((output, errors))
+            stats.processed += block_stats.processed
+            stats.rejected += block_stats.rejected
+            if failures:
+                break
+    finally:
+        stopped.set()
+        outputs.put(STOP)
+        writer.join()
+        while reader.is_alive():
+            try:
+                blocks.get(timeout=0.01)
+            except queue.Empty:
+                pass
+    if failures:
+        raise failures[0]
+    return stats
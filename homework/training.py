@@ -0,0 +1,488 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import Enum
+from functools import wraps
+from inspect import signature
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type
+
+
+class InvalidInputDataError(Exception):
+    pass
+
+
+class RejectReason(Enum):
+    UNKNOWN_TYPE = 'unknown_type'
+    ARITY = 'arity'
+    NOT_POSITIVE = 'not_positive'
+    OUT_OF_RANGE = 'out_of_range'
+
+
+class RejectedPackageError(InvalidInputDataError):
+    """Пакет не прошел проверку по схеме типа тренировки."""
+
+    def __init__(
+        self, reason: RejectReason, workout_type: str, data: List[float],
+    ) -> None:
+        super().__init__(f'{reason.value}: {workout_type} {data}')
+        self.reason = reason
+
+
+@dataclass
+class InfoMessage:
+    """Информационное сообщение о тренировке."""
+
+    __slots__ = ('training_type', 'duration', 'distance', 'speed', 'calories')
+
+    training_type: str
+    duration: float
+    distance: float
+    speed: float
+    calories: float
+
+    def get_message(self):
+        return (
+            f'Тип тренировки: {self.training_type};'
+            f' Длительность: {self.duration:.3f} ч.;'
+            f' Дистанция: {self.distance:.3f} км;'
+            f' Ср. скорость: {self.speed:.3f} км/ч;'
+            f' Потрачено ккал: {self.calories:.3f}.'
+        )
+
+
+class Training:
+    """Расчет показателей тренировки.
+
+    - get_distance() - расчет дистанции,
+    - get_mean_speed() - расчет скорости,
+    - get_spent_calories() - расчет каллорий,
+    - speed_from_distance() - скорость по готовой дистанции,
+    - calories_from_speed() - калории по готовой скорости,
+    - get_metrics() - расчет всех показателей за один проход,
+    - show_training_info() - показ сообщения тренировки.
+    """
+
+    LEN_STEP = 0.65
+    M_IN_KM = 1000
+    MIN_IN_H = 60
+
+    def __init__(self, action: int, duration: float, weight: float) -> None:
+        self.action = action
+        self.duration = duration
+        self.weight = weight
+
+    def get_distance(self) -> float:
+        """Получить дистанцию в км."""
+        return self.action * self.LEN_STEP / self.M_IN_KM
+
+    def get_mean_speed(self) -> float:
+        """Получить среднюю скорость движения."""
+        return self.speed_from_distance(self.get_distance())
+
+    def get_spent_calories(self) -> float:
+        """Получить количество затраченных калорий."""
+        return self.calories_from_speed(self.get_mean_speed())
+
+    def speed_from_distance(self, distance: float) -> float:
+        """Получить среднюю скорость по дистанции distance."""
+        return distance / self.duration
+
+    def calories_from_speed(self, speed: float) -> float:
+        """Получить калории при средней скорости speed."""
+
+    def get_metrics(self) -> Tuple[float, float, float]:
+        """Получить дистанцию, скорость и калории.
+
+        Дистанция считается один раз, скорость выводится из нее, а
+        калории - из скорости. Если get_mean_speed() или
+        get_spent_calories() переопределены (в подклассе, кэшированием
+        или у объекта), показатели берутся из них.
+        """
+        for name in ('get_mean_speed', 'get_spent_calories'):
+            method = getattr(getattr(self, name), '__func__', None)
+            if method is not getattr(Training, name):
+                return (
+                    self.get_distance(),
+                    self.get_mean_speed(),
+                    self.get_spent_calories(),
+                )
+        distance = self.get_distance()
+        speed = self.speed_from_distance(distance)
+        return distance, speed, self.calories_from_speed(speed)
+
+    @classmethod
+    def get_batch_metrics(
+        cls,
+        action: Sequence[float],
+        duration: Sequence[float],
+        weight: Sequence[float],
+    ) -> Tuple[List[float], List[float], List[float]]:
+        """Рассчитать дистанцию, скорость и калории по столбцам данных."""
+        distance = [act * cls.LEN_STEP / cls.M_IN_KM for act in action]
+        speed = [dist / dur for dist, dur in zip(distance, duration)]
+        return distance, speed, [None] * len(distance)
+
+    def show_training_info(self) -> InfoMessage:
+        """Вернуть информационное сообщение о выполненной тренировке."""
+        return InfoMessage(
+            type(self).__name__, self.duration, *self.get_metrics(),
+        )
+
+
+class Running(Training):
+    CALORIES_MEAN_SPEED_MULTIPLIER = 18
+    CALORIES_MEAN_SPEED_SHIFT = 1.79
+
+    def calories_from_speed(self, speed: float) -> float:
+        return (
+            (
+                self.CALORIES_MEAN_SPEED_MULTIPLIER * speed
+                + self.CALORIES_MEAN_SPEED_SHIFT
+            )
+            * self.weight
+            / self.M_IN_KM
+            * self.duration
+            * self.MIN_IN_H
+        )
+
+    @classmethod
+    def get_batch_metrics(cls, action, duration, weight):
+        distance, speed, _ = super().get_batch_metrics(
+            action, duration, weight,
+        )
+        calories = [
+            (
+                cls.CALORIES_MEAN_SPEED_MULTIPLIER * spd
+                + cls.CALORIES_MEAN_SPEED_SHIFT
+            )
+            * wgt
+            / cls.M_IN_KM
+            * dur
+            * cls.MIN_IN_H
+            for spd, wgt, dur in zip(speed, weight, duration)
+        ]
+        return distance, speed, calories
+
+
+class SportsWalking(Training):
+    CALORIES_WEIGHT_MULTIPLIER = 0.035
+    CALORIES_SPEED_HEIGHT_MULTIPLIER = 0.029
+    KMH_IN_MSEC = 0.278  # Training.M_IN_KM / 3600 (секунд в часе)
+    CM_IN_M = 100
+
+    def __init__(
+        self,
+        action,
+        duration,
+        weight,
+        height,
+    ) -> None:
+        super().__init__(action, duration, weight)
+        self.height = height
+
+    def calories_from_speed(self, speed: float) -> float:
+        return (
+            (
+                self.CALORIES_WEIGHT_MULTIPLIER * self.weight
+                + (
+                    (speed * self.KMH_IN_MSEC) ** 2
+                    / (self.height / self.CM_IN_M)
+                )
+                * self.CALORIES_SPEED_HEIGHT_MULTIPLIER
+                * self.weight
+            )
+            * self.duration
+            * self.MIN_IN_H
+        )
+
+    @classmethod
+    def get_batch_metrics(cls, action, duration, weight, height):
+        distance, speed, _ = super().get_batch_metrics(
+            action, duration, weight,
+        )
+        calories = [
+            (
+                cls.CALORIES_WEIGHT_MULTIPLIER * wgt
+                + (
+                    (spd * cls.KMH_IN_MSEC) ** 2
+                    / (hgt / cls.CM_IN_M)
+                )
+                * cls.CALORIES_SPEED_HEIGHT_MULTIPLIER
+                * wgt
+            )
+            * dur
+            * cls.MIN_IN_H
+            for spd, wgt, hgt, dur in zip(speed, weight, height, duration)
+        ]
+        return distance, speed, calories
+
+
+class Swimming(Training):
+    LEN_STEP = 1.38
+    CALORIES_WEIGHT_MULTIPLIER = 2
+    CALORIES_MEAN_SPEED_SHIFT = 1.1
+
+    def __init__(
+        self,
+        action,
+        duration,
+        weight,
+        length_pool,
+        count_pool,
+    ) -> None:
+        super().__init__(action, duration, weight)
+        self.count_pool = count_pool
+        self.length_pool = length_pool
+
+    def speed_from_distance(self, distance: float) -> float:
+        # Скорость в бассейне считается по длине и числу дорожек.
+        return (
+            self.length_pool * self.count_pool / self.M_IN_KM / self.duration
+        )
+
+    def calories_from_speed(self, speed: float) -> float:
+        return (
+            (speed + self.CALORIES_MEAN_SPEED_SHIFT)
+            * self.CALORIES_WEIGHT_MULTIPLIER
+            * self.weight
+            * self.duration
+        )
+
+    @classmethod
+    def get_batch_metrics(
+        cls, action, duration, weight, length_pool, count_pool,
+    ):
+        distance = [act * cls.LEN_STEP / cls.M_IN_KM for act in action]
+        speed = [
+            length * count / cls.M_IN_KM / dur
+            for length, count, dur in zip(length_pool, count_pool, duration)
+        ]
+        calories = [
+            (spd + cls.CALORIES_MEAN_SPEED_SHIFT)
+            * cls.CALORIES_WEIGHT_MULTIPLIER
+            * wgt
+            * dur
+            for spd, wgt, dur in zip(speed, weight, duration)
+        ]
+        return distance, speed, calories
+
+
+def cached_metric(method: Callable[[Any], float]) -> Callable[[Any], float]:
+    """Запомнить результат расчета до изменения параметров тренировки."""
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self):
+        metrics = self.__dict__.get('_metrics')
+        if metrics is None:
+            metrics = self.__dict__['_metrics'] = {}
+        elif name in metrics:
+            return metrics[name]
+        value = metrics[name] = method(self)
+        return value
+
+    return wrapper
+
+
+class CachedMetricsMixin:
+    """Кэширование показателей тренировки.
+
+    Показатели из CACHED_METRICS вычисляются один раз, и повторные
+    вызовы (в том числе вложенные, например get_mean_speed() внутри
+    get_spent_calories()) берут значение из кэша. Кэш сбрасывается при
+    изменении любого атрибута тренировки.
+    """
+
+    CACHED_METRICS = ('get_distance', 'get_mean_speed', 'get_spent_calories')
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        for name in cls.CACHED_METRICS:
+            method = getattr(cls, name)
+            if not hasattr(method, '__wrapped__'):
+                setattr(cls, name, cached_metric(method))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self.__dict__[name] = value
+        self.__dict__.pop('_metrics', None)
+
+
+def make_cached(training: Type[Training]) -> Type[Training]:
+    """Получить вариант класса тренировки с кэшированием показателей."""
+    return type(training.__name__, (CachedMetricsMixin, training), {
+        '__qualname__': f'Cached{training.__qualname__}',
+        '__doc__': training.__doc__,
+    })
+
+
+class TrainingTypes(Enum):
+    SWM = Swimming
+    RUN = Running
+    WLK = SportsWalking
+
+
+# Допустимые значения параметров: включительные границы и признак
+# строгой положительности (ноль приводит к делению на ноль в расчетах).
+PARAM_LIMITS = {
+    'action': (0, 1_000_000, False),
+    'duration': (0, 24, True),
+    'weight': (0, 500, True),
+    'height': (0, 300, True),
+    'length_pool': (0, 100, True),
+    'count_pool': (0, 10_000, False),
+}
+
+
+BatchMetrics = Tuple[List[float], List[float], List[float]]
+
+
+@dataclass(frozen=True)
+class TrainingSpec:
+    """Зарегистрированный тип тренировки.
+
+    index - номер типа в двоичных форматах, params - имена параметров
+    пакета, batch - расчет показателей по столбцам параметров.
+    """
+
+    code: str
+    index: int
+    training: Type[Training]
+    params: Tuple[str, ...]
+    batch: Callable[..., BatchMetrics]
+
+
+TRAINING_REGISTRY: Dict[str, TrainingSpec] = {}
+REGISTERED_TRAININGS: List[TrainingSpec] = []
+TRAINING_CODES: Dict[str, int] = {}
+MAX_REGISTERED_TRAININGS = 255
+
+
+def scalar_batch_metrics(
+    training: Type[Training],
+) -> Callable[..., BatchMetrics]:
+    """Расчет по столбцам через объекты тренировок, по одному на строку."""
+    def batch(*columns: Sequence[float]) -> BatchMetrics:
+        metrics = [training(*row).get_metrics() for row in zip(*columns)]
+        if not metrics:
+            return [], [], []
+        distance, speed, calories = map(list, zip(*metrics))
+        return distance, speed, calories
+
+    return batch
+
+
+def register_training(
+    code: str,
+    training: Type[Training],
+    limits: Dict[str, Tuple[float, float, bool]] = None,
+    batch: Callable[..., BatchMetrics] = None,
+) -> TrainingSpec:
+    """Зарегистрировать тип тренировки с кодом пакета code.
+
+    Параметры пакета берутся из сигнатуры конструктора training; для
+    параметров, которых нет в PARAM_LIMITS, нужно передать limits;
+    границы уже известных параметров изменить нельзя. Если batch не
+    задан, используется get_batch_metrics(), объявленный в самом
+    классе training: унаследованная формула не учитывает переопределенные
+    в подклассе методы, поэтому для него расчет идет через объекты.
+    """
+    if code in TRAINING_REGISTRY:
+        raise ValueError(f'Тип тренировки {code} уже зарегистрирован')
+    if len(REGISTERED_TRAININGS) >= MAX_REGISTERED_TRAININGS:
+        raise ValueError('Превышено число типов тренировок')
+    params = tuple(signature(training).parameters)
+    limits = limits or {}
+    changed = [
+        name for name, bounds in limits.items()
+        if PARAM_LIMITS.get(name, bounds) != bounds
+    ]
+    if changed:
+        raise ValueError(f'Нельзя изменить границы параметров {changed}')
+    limits = {**PARAM_LIMITS, **limits}
+    missing = [name for name in params if name not in limits]
+    if missing:
+        raise ValueError(f'Не заданы границы параметров {missing}')
+    if batch is None:
+        batch = (
+            training.get_batch_metrics
+            if 'get_batch_metrics' in vars(training)
+            else scalar_batch_metrics(training)
+        )
+    PARAM_LIMITS.update(limits)
+    spec = TrainingSpec(
+        code, len(REGISTERED_TRAININGS), training, params, batch,
+    )
+    TRAINING_REGISTRY[code] = spec
+    REGISTERED_TRAININGS.append(spec)
+    TRAINING_CODES.setdefault(training.__name__, spec.index)
+    return spec
+
+
+def unregister_training(code: str) -> None:
+    """Отменить регистрацию типа тренировки code.
+
+    Снять можно только последний зарегистрированный тип, иначе
+    сдвинулись бы коды типов в двоичных форматах. Границы параметров,
+    которые больше не нужны ни одному типу, удаляются из PARAM_LIMITS.
+    """
+    spec = TRAINING_REGISTRY.get(code)
+    if spec is None:
+        raise ValueError(f'Тип тренировки {code} не зарегистрирован')
+    if spec is not REGISTERED_TRAININGS[-1]:
+        raise ValueError(
+            f'Тип тренировки {code} зарегистрирован не последним',
+        )
+    del TRAINING_REGISTRY[code]
+    REGISTERED_TRAININGS.pop()
+    name = spec.training.__name__
+    if TRAINING_CODES.get(name) == spec.index:
+        del TRAINING_CODES[name]
+    used = {param for other in REGISTERED_TRAININGS for param in other.params}
+    for param in set(PARAM_LIMITS) - used:
+        del PARAM_LIMITS[param]
+
+
+for member in TrainingTypes:
+    register_training(member.name, member.value)
+
+
+def read_package(workout_type: str, data: List[float]) -> Training:
+    """Прочитать данные полученные от датчиков."""
+    try:
+        return TRAINING_REGISTRY[workout_type].training(*data)
+    except (KeyError, TypeError) as err:
+        raise InvalidInputDataError(err)
+
+
+def compute_batch(
+    workout_types: Sequence[str],
+    columns: Sequence[Sequence[float]],
+) -> BatchMetrics:
+    """Рассчитать показатели для массива тренировок.
+
+    columns[k] - k-й параметр пакета для каждой тренировки; лишние
+    параметры тренировок с меньшим числом данных игнорируются.
+    Возвращает столбцы дистанций, скоростей и калорий в исходном порядке.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, workout_type in enumerate(workout_types):
+        groups.setdefault(workout_type, []).append(index)
+    size = len(workout_types)
+    distance, speed, calories = [0.0] * size, [0.0] * size, [0.0] * size
+    for workout_type, indices in groups.items():
+        try:
+            spec = TRAINING_REGISTRY[workout_type]
+        except KeyError as err:
+            raise InvalidInputDataError(err)
+        results = spec.batch(*(
+            [column[index] for index in indices]
+            for column in columns[:len(spec.params)]
+        ))
+        for target, values in zip((distance, speed, calories), results):
+            for index, value in zip(indices, values):
+                target[index] = value
+    return distance, speed, calories
+
+
+def main(training: Training) -> None:
+    print(training.show_training_info().get_message())  # noqa: T201
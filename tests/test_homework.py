@@ -1,7 +1,13 @@
+import asyncio
+import csv
+import dataclasses
+import json
+import math
 import re
 import pytest
 import types
 import inspect
+from io import BytesIO, StringIO
 from conftest import Capturing
 
 try:
@@ -474,3 +480,1218 @@ def test_main_output(input_data, expected):
     assert (
         get_message_output == expected
     ), 'Метод `main` должен печатать результат в консоль.\n'
+
+
+def test_compute_batch():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('WLK', [9000, 1, 75, 180]),
+        ('RUN', [1206, 12, 6]),
+        ('WLK', [3000.33, 2.512, 75.8, 180.1]),
+    ]
+    workout_types = [workout for workout, _ in packages]
+    columns = [
+        [data[k] if k < len(data) else 0 for _, data in packages]
+        for k in range(5)
+    ]
+    distance, speed, calories = homework.compute_batch(
+        workout_types, columns,
+    )
+    for index, package in enumerate(packages):
+        training = homework.read_package(*package)
+        assert (
+            distance[index],
+            speed[index],
+            calories[index],
+        ) == (
+            training.get_distance(),
+            training.get_mean_speed(),
+            training.get_spent_calories(),
+        ), (
+            '`compute_batch` должна возвращать те же значения, '
+            'что и методы классов тренировок.'
+        )
+
+
+def test_compute_chunk():
+    packages = list(homework.check_packages(homework.parse_packages(
+        csv.reader(StringIO(PACKAGES_CSV)),
+    )))
+    expected = list(homework.compute_messages(
+        homework.validate_packages(packages),
+    ))
+    assert homework.compute_chunk(packages) == expected, (
+        '`compute_chunk` должна давать те же результаты, что и '
+        'расчет по одной тренировке.'
+    )
+    unchecked = [('RUN', [15000, 1, 75]), ('CYC', [1, 2])]
+    results = homework.compute_chunk(unchecked)
+    assert results[0] == expected[1]
+    assert isinstance(results[1], homework.InvalidInputDataError), (
+        'Ошибка расчета столбцами должна достаться только своей строке.'
+    )
+
+
+def test_run_pipeline():
+    source = StringIO('SWM,720,1,80,25,40\nMISSING,1,2\nRUN,\nRUN,1\n')
+    sink, error_sink = StringIO(), StringIO()
+    stats = homework.run_pipeline(source, sink, error_sink, chunk_size=2)
+    assert sink.getvalue().splitlines() == [
+        'Тип тренировки: Swimming; '
+        'Длительность: 1.000 ч.; '
+        'Дистанция: 0.994 км; '
+        'Ср. скорость: 1.000 км/ч; '
+        'Потрачено ккал: 336.000.'
+    ], 'Корректные пакеты должны попадать в основной поток вывода.'
+    assert len(error_sink.getvalue().splitlines()) == 3, (
+        'Некорректные пакеты должны попадать в поток ошибок.'
+    )
+    assert (stats.processed, stats.rejected) == (1, 3), (
+        '`run_pipeline` должна считать обработанные и отклоненные пакеты.'
+    )
+
+
+PACKAGES_CSV = (
+    'SWM,720,1,80,25,40\n'
+    'RUN,15000,1,75\n'
+    'WLK,9000,1,75,180\n'
+    'MISSING,1,2\n'
+    'RUN,1\n'
+    'RUN,\n'
+    ',15,1,90\n'
+) * 20
+
+
+def test_split_file(tmp_path):
+    path = tmp_path / 'packages.csv'
+    path.write_text(PACKAGES_CSV)
+    ranges = homework.split_file(str(path), chunk_bytes=50)
+    data = path.read_bytes()
+    assert b''.join(data[start:end] for start, end in ranges) == data, (
+        'Диапазоны `split_file` должны покрывать весь файл.'
+    )
+    for start, end in ranges:
+        assert data[start:end].endswith(b'\n'), (
+            '`split_file` должна выравнивать диапазоны по границам строк.'
+        )
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_run_parallel(tmp_path, ordered):
+    path = tmp_path / 'packages.csv'
+    path.write_text(PACKAGES_CSV)
+    expected, expected_errors = StringIO(), StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, expected_errors)
+    sink, error_sink = StringIO(), StringIO()
+    stats = homework.run_parallel(
+        str(path), sink, error_sink, 2, ordered, chunk_bytes=100,
+    )
+    result = sink.getvalue().splitlines()
+    if ordered:
+        assert result == expected.getvalue().splitlines(), (
+            '`run_parallel` должна сохранять порядок пакетов.'
+        )
+    assert sorted(result) == sorted(expected.getvalue().splitlines())
+    assert (stats.processed, stats.rejected) == (60, 80)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_iter_bounded(ordered):
+    from concurrent.futures import ThreadPoolExecutor
+
+    submitted = []
+
+    def task(number):
+        return number, len(submitted)
+
+    with ThreadPoolExecutor(2) as executor:
+        results = []
+        for number, seen in homework.iter_bounded(
+            executor, task, ((number,) for number in range(20)), 3, ordered,
+        ):
+            submitted.append(number)
+            results.append((number, seen))
+    assert sorted(number for number, _ in results) == list(range(20))
+    assert all(number - seen <= 3 for number, seen in results), (
+        'В пуле должно быть не больше limit задач одновременно.'
+    )
+
+
+def test_TrainingBatch():
+    packages = [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('WLK', [9000, 1, 75, 180]),
+    ]
+    batch = homework.TrainingBatch()
+    for package in packages:
+        batch.append(*package)
+    with pytest.raises(homework.InvalidInputDataError):
+        batch.append('RUN', [1])
+    assert len(batch) == len(packages)
+    metrics = list(zip(*batch.get_metrics()))
+    for index, package in enumerate(packages):
+        training = homework.read_package(*package)
+        assert type(batch[index]) is type(training), (
+            '`TrainingBatch` должен возвращать объект класса тренировки.'
+        )
+        assert batch[index].show_training_info() == (
+            training.show_training_info()
+        )
+        assert metrics[index] == (
+            training.get_distance(),
+            training.get_mean_speed(),
+            training.get_spent_calories(),
+        ), '`TrainingBatch.get_metrics` рассчитывает неверные значения.'
+
+
+@pytest.mark.parametrize(
+    'input_data',
+    [
+        ('SWM', [720, 1, 80, 25, 40]),
+        ('RUN', [15000, 1, 75]),
+        ('WLK', [9000, 1, 75, 180]),
+    ],
+)
+def test_make_cached(input_data):
+    workout_type, data = input_data
+    training_class = homework.TrainingTypes[workout_type].value
+    cached = homework.make_cached(training_class)(*data)
+    training = training_class(*data)
+    assert cached.show_training_info() == training.show_training_info(), (
+        'Кэширование не должно менять показатели тренировки.'
+    )
+    cached.duration = training.duration = 2
+    assert cached.get_metrics() == training.get_metrics(), (
+        'Кэш показателей должен сбрасываться при изменении параметров.'
+    )
+    calls = []
+    get_distance = training.get_distance
+    training.get_distance = lambda: calls.append(1) or get_distance()
+    metrics = training.get_metrics()
+    assert calls == [1], (
+        '`get_metrics` должен рассчитывать дистанцию один раз.'
+    )
+    assert metrics == (
+        get_distance(),
+        training.get_mean_speed(),
+        training.get_spent_calories(),
+    )
+
+
+def test_format_messages():
+    messages = [
+        homework.InfoMessage('Swimming', 1.0, 75.0, 1.0, 80.0),
+        homework.InfoMessage('Running', 4.0, 20.0, 4.0, 20.5),
+    ]
+    assert homework.format_messages(messages).splitlines() == [
+        message.get_message() for message in messages
+    ], 'Текстовый формат должен совпадать с `InfoMessage.get_message`.'
+    assert homework.format_messages(messages, 'csv').splitlines() == [
+        'Swimming,1.0,75.0,1.0,80.0',
+        'Running,4.0,20.0,4.0,20.5',
+    ]
+    assert [
+        json.loads(line)
+        for line in homework.format_messages(messages, 'jsonl').splitlines()
+    ] == [dataclasses.asdict(message) for message in messages]
+    records = list(homework.BINARY_RECORD.iter_unpack(
+        homework.format_messages(messages, 'binary'),
+    ))
+    assert records == [
+        (0, 1.0, 75.0, 1.0, 80.0),
+        (1, 4.0, 20.0, 4.0, 20.5),
+    ], 'Двоичные записи должны содержать код типа и показатели.'
+
+
+def test_TrainingBatch_save_load(tmp_path):
+    path = tmp_path / 'packages.trpk'
+    error_sink = StringIO()
+    stats = homework.convert_to_binary(
+        StringIO(PACKAGES_CSV), str(path), error_sink,
+    )
+    assert (stats.processed, stats.rejected) == (60, 80)
+    assert homework.is_batch_file(str(path))
+    batch = homework.TrainingBatch.load(str(path))
+    assert len(batch) == 60
+    expected = StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, StringIO())
+    sink = StringIO()
+    homework.run_batch(batch, sink, chunk_size=7)
+    assert sink.getvalue() == expected.getvalue(), (
+        'Результаты двоичного и текстового форматов должны совпадать.'
+    )
+
+
+def test_TrainingBatch_load_invalid(tmp_path):
+    path = tmp_path / 'packages.trpk'
+    homework.convert_to_binary(StringIO(PACKAGES_CSV), str(path), StringIO())
+    data = path.read_bytes()
+    header = homework.BATCH_HEADER.size
+    broken = [
+        (data[:header - 1], 'короче заголовка'),
+        (data[:-8], 'нужно'),
+        (data + bytes(8), 'нужно'),
+        (data[:header] + b'\xff' + data[header + 1:], 'неизвестный код'),
+    ]
+    for content, message in broken:
+        path.write_bytes(content)
+        with pytest.raises(homework.InvalidInputDataError, match=message):
+            homework.TrainingBatch.load(str(path))
+
+
+@pytest.fixture
+def register():
+    """Регистрировать типы тренировок только на время теста."""
+    codes = []
+
+    def register(code, training, **kwargs):
+        spec = homework.register_training(code, training, **kwargs)
+        codes.append(code)
+        return spec
+
+    yield register
+    for code in reversed(codes):
+        if code in homework.TRAINING_REGISTRY:
+            homework.unregister_training(code)
+
+
+class Stretching(homework.Training):
+    def __init__(self, duration, weight, action):
+        super().__init__(action, duration, weight)
+
+    def get_spent_calories(self):
+        return self.weight * self.duration
+
+
+def test_TrainingBatch_duration_column(register):
+    register('STR', Stretching)
+    batch = homework.TrainingBatch()
+    batch.append('STR', [1.5, 80, 100])
+    batch.append('RUN', [15000, 1, 75])
+    assert [message.duration for message in batch.get_messages()] == [
+        1.5, 1,
+    ], 'Длительность должна браться из столбца duration своего типа.'
+
+
+def test_start_server():
+    async def exchange():
+        server = await homework.start_server('127.0.0.1:0')
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(PACKAGES_CSV.encode())
+            writer.write_eof()
+            response = await reader.read()
+            writer.close()
+        return response.decode()
+
+    expected, expected_errors = StringIO(), StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, expected_errors)
+    response = asyncio.run(exchange()).splitlines()
+    assert len(response) == len(PACKAGES_CSV.splitlines()), (
+        'Сервер должен отвечать на каждый пакет.'
+    )
+    assert [
+        line for line in response if line.startswith('Тип тренировки')
+    ] == expected.getvalue().splitlines()
+    assert [
+        line for line in response if not line.startswith('Тип тренировки')
+    ] == expected_errors.getvalue().splitlines()
+
+
+def test_start_server_malformed():
+    async def exchange(data):
+        server = await homework.start_server('127.0.0.1:0')
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(data)
+            writer.write_eof()
+            response = await reader.read()
+            writer.close()
+        return response.decode().splitlines()
+
+    valid = homework.process_text('RUN,15000,1,75')[0].rstrip('\n')
+    response = asyncio.run(exchange(b'RUN,15000,1,75\nRUN,\xff,1,75\n'))
+    assert response[0] == valid and len(response) == 2, (
+        'Неверный UTF-8 должен отклоняться только в своей строке.'
+    )
+    assert response[1].startswith('Не корректные входные данные')
+    response = asyncio.run(exchange(
+        b'RUN,15000,1,75\n' + b'1' * (homework.MAX_LINE_BYTES * 3)
+        + b'\nRUN,15000,1,75\n',
+    ))
+    assert len(response) == 3 and response[0] == response[2] == valid
+    assert 'длиннее' in response[1], (
+        'Слишком длинная строка должна отклоняться один раз.'
+    )
+
+
+@pytest.mark.parametrize('output_format', ['text', 'jsonl'])
+def test_run_client(tmp_path, output_format):
+    import threading
+
+    expected, expected_errors = StringIO(), StringIO()
+    homework.run_pipeline(
+        StringIO(PACKAGES_CSV), expected, expected_errors,
+        output_format=output_format,
+    )
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(homework.start_server('127.0.0.1:0'))
+    port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        sink, error_sink = BytesIO(), BytesIO()
+        homework.run_client(
+            f'127.0.0.1:{port}',
+            BytesIO(PACKAGES_CSV.encode()),
+            sink,
+            error_sink,
+            output_format,
+        )
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+    assert sink.getvalue().decode() == expected.getvalue(), (
+        'Клиент должен выводить результаты в выбранном формате.'
+    )
+    assert error_sink.getvalue().decode() == expected_errors.getvalue(), (
+        'Ошибки должны выводиться отдельно от результатов.'
+    )
+
+
+def test_run_pipeline_instrumentation():
+    instrumentation = homework.Instrumentation()
+    expected, sink = StringIO(), StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, StringIO())
+    stats = homework.run_pipeline(
+        StringIO(PACKAGES_CSV),
+        sink,
+        StringIO(),
+        chunk_size=50,
+        instrumentation=instrumentation,
+    )
+    assert sink.getvalue() == expected.getvalue(), (
+        'Замеры не должны влиять на результаты обработки.'
+    )
+    snapshot = instrumentation.snapshot()
+    assert snapshot['rows'] == {
+        'processed': stats.processed, 'rejected': stats.rejected,
+    }
+    assert snapshot['errors'] == {
+        'unknown_type': 40, 'arity': 20, 'ValueError': 20,
+    }
+    assert {
+        name: histogram['count']
+        for name, histogram in snapshot['trainings'].items()
+    } == {'Swimming': 20, 'Running': 20, 'SportsWalking': 20}
+    assert snapshot['stages']['parse']['count'] == 3
+    prometheus = instrumentation.to_prometheus()
+    assert 'homework_rows_total{status="processed"} 60' in prometheus
+    assert (
+        'homework_stage_seconds_count{stage="compute"} 3' in prometheus
+    )
+
+
+def test_UserAggregator():
+    day = homework.DAY_SECONDS
+    running = homework.InfoMessage('Running', 1.0, 9.75, 9.75, 797.805)
+    walking = homework.InfoMessage('SportsWalking', 1.0, 5.85, 5.85, 349.25)
+    aggregator = homework.UserAggregator(
+        window=7 * day, bucket=day, max_users=2,
+    )
+    aggregator.add('alice', 0.5 * day, running)
+    aggregator.add('alice', 1.5 * day, running)
+    aggregator.add('alice', 6.5 * day, walking)
+    assert aggregator.tumbling('alice')['Running'].trainings == 2
+    aggregator.add('alice', 7.5 * day, walking)
+    assert 'Running' not in aggregator.tumbling('alice'), (
+        'Фиксированное окно должно начинаться заново.'
+    )
+    sliding = aggregator.sliding('alice')
+    assert sliding['Running'].trainings == 1, (
+        'Скользящее окно должно исключать устаревшие тренировки.'
+    )
+    assert sliding['SportsWalking'].distance == pytest.approx(11.7)
+    assert sliding['SportsWalking'].mean_speed == pytest.approx(5.85)
+    aggregator.add('bob', 8 * day, running)
+    aggregator.add('carol', 8 * day, running)
+    assert len(aggregator) == 2 and aggregator.sliding('alice') == {}, (
+        'Дольше всех не обновлявшиеся пользователи должны вытесняться.'
+    )
+    aggregator = homework.UserAggregator(window=7 * day, bucket=day)
+    aggregator.add('alice', 0.5 * day, running)
+    assert aggregator.sliding('alice')['Running'].trainings == 1
+    aggregator.add('bob', 30 * day, running)
+    assert aggregator.sliding('alice') == {}, (
+        'Окна должны истекать по времени потока, а не пользователя.'
+    )
+    assert aggregator.tumbling('alice') == {}
+    assert aggregator.sliding('bob', now=36.5 * day)['Running'].trainings == 1
+    assert aggregator.sliding('bob', now=37.5 * day) == {}
+
+
+def test_ResultCache(tmp_path):
+    cache = homework.ResultCache(max_size=2)
+    expected, sink = StringIO(), StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, StringIO())
+    stats = homework.run_pipeline(
+        StringIO(PACKAGES_CSV), sink, StringIO(), cache=cache,
+    )
+    assert sink.getvalue() == expected.getvalue(), (
+        'Кэш не должен влиять на результаты обработки.'
+    )
+    assert stats.processed == 60 and len(cache) == 2
+    assert cache.hits == 0, (
+        'При циклическом обходе трех пакетов LRU-кэш на два '
+        'элемента не должен давать попаданий.'
+    )
+    path = str(tmp_path / 'cache.json')
+    cache.save(path)
+    loaded = homework.ResultCache.load(path)
+    loaded.get_message('WLK', [9000, 1, 75, 180])
+    assert (loaded.hits, loaded.misses) == (1, 0), (
+        'Загруженный кэш должен содержать сохраненные результаты.'
+    )
+    expired = homework.ResultCache.load(path, ttl=-1)
+    expired.get_message('WLK', [9000, 1, 75, 180])
+    assert expired.misses == 1, 'Устаревшие результаты должны пересчитываться.'
+    stored, message = loaded.entries['WLK', (9000.0, 1.0, 75.0, 180.0)]
+    loaded.entries['WLK', (object(),)] = (stored, message)
+    with pytest.raises(TypeError):
+        loaded.save(path)
+    assert len(homework.ResultCache.load(path)) == 2, (
+        'Прерванное сохранение не должно портить файл кэша.'
+    )
+
+
+@pytest.mark.parametrize(
+    'package, reason',
+    [
+        (('SWM', [720, 1, 80, 25, 40]), None),
+        (('RUN', [0, 1, 75]), None),
+        (('CYC', [100, 1, 75]), 'unknown_type'),
+        (('RUN', [15000, 1]), 'arity'),
+        (('RUN', [15000, 0, 75]), 'not_positive'),
+        (('WLK', [9000, 1, 75, 0]), 'not_positive'),
+        (('SWM', [720, 1, -80, 25, 40]), 'not_positive'),
+        (('RUN', [-1, 1, 75]), 'out_of_range'),
+        (('RUN', [15000, 1, float('nan')]), 'out_of_range'),
+        (('WLK', [9000, 1, 75, float('inf')]), 'out_of_range'),
+    ],
+)
+def test_check_chunk(package, reason):
+    valid = ('RUN', [15000, 1, 75])
+    results = homework.check_chunk([valid, package, valid])
+    assert results[0] == results[2] == valid
+    if reason is None:
+        assert results[1] == package
+    else:
+        assert isinstance(results[1], homework.RejectedPackageError), (
+            'Некорректный пакет должен заменяться ошибкой проверки.'
+        )
+        assert results[1].reason.value == reason
+
+
+def test_run_pipeline_zero_duration():
+    sink, error_sink = StringIO(), StringIO()
+    stats = homework.run_pipeline(
+        StringIO('RUN,15000,0,75\nWLK,9000,1,75,0\nRUN,15000,1,75\n'),
+        sink,
+        error_sink,
+    )
+    assert (stats.processed, stats.rejected) == (1, 2), (
+        'Нулевые длительность и рост не должны прерывать обработку.'
+    )
+
+
+class Cycling(homework.Training):
+    LEN_STEP = 5.5
+
+    def __init__(self, action, duration, weight, power):
+        super().__init__(action, duration, weight)
+        self.power = power
+
+    def get_spent_calories(self):
+        return self.power * self.duration * 3.6
+
+
+class Rowing(homework.Training):
+    def __init__(self, action, duration, weight, strokes_per_minute):
+        super().__init__(action, duration, weight)
+        self.strokes_per_minute = strokes_per_minute
+
+
+@pytest.fixture
+def cycling(register):
+    return register('CYC', Cycling, limits={'power': (0, 2000, True)})
+
+
+def test_register_training(cycling):
+    with pytest.raises(ValueError):
+        homework.register_training('CYC', Cycling)
+    with pytest.raises(ValueError):
+        homework.register_training('ROW', Rowing)
+    training = homework.read_package('CYC', [3600, 1.5, 80, 200])
+    assert isinstance(training, Cycling)
+    sink, error_sink = StringIO(), StringIO()
+    stats = homework.run_pipeline(
+        StringIO('CYC,3600,1.5,80,200\nCYC,3600,1.5,80,0\n'),
+        sink,
+        error_sink,
+    )
+    assert (stats.processed, stats.rejected) == (1, 1)
+    assert sink.getvalue() == training.show_training_info().get_message() + (
+        '\n'
+    ), 'Новый тип тренировки должен обрабатываться конвейером.'
+    assert homework.compute_batch(
+        ['CYC', 'RUN'], [[3600, 15000], [1.5, 1], [80, 75], [200, 0]],
+    )[2][0] == training.get_spent_calories(), (
+        'Новый тип тренировки должен поддерживаться пакетным расчетом.'
+    )
+
+
+class TrailRunning(homework.Running):
+    def get_spent_calories(self):
+        return super().get_spent_calories() * 1.2
+
+
+class HillyRunning(homework.Running):
+    def __init__(self, action, duration, weight, climb):
+        super().__init__(action, duration, weight)
+        self.climb = climb
+
+
+@pytest.mark.parametrize('code, training, row', [
+    ('TRL', TrailRunning, [15000, 1, 75]),
+    ('HIL', HillyRunning, [15000, 1, 75, 300]),
+])
+def test_register_training_subclass(register, code, training, row):
+    register(code, training, limits={'climb': (0, 10_000, False)})
+    expected = training(*row).get_metrics()
+    columns = [[value] for value in row]
+    result = homework.compute_batch([code], columns)
+    assert tuple(metric[0] for metric in result) == expected, (
+        'Подкласс без своего get_batch_metrics() должен считаться '
+        'через объекты тренировок.'
+    )
+
+
+def test_unregister_training(register, cycling):
+    register('STR', Stretching)
+    with pytest.raises(ValueError):
+        homework.unregister_training('CYC')
+    homework.unregister_training('STR')
+    assert 'STR' not in homework.TRAINING_REGISTRY
+    assert 'Stretching' not in homework.TRAINING_CODES
+    assert homework.REGISTERED_TRAININGS[-1] is cycling
+    assert 'power' in homework.PARAM_LIMITS, (
+        'Границы параметров зарегистрированных типов должны сохраняться.'
+    )
+    with pytest.raises(ValueError):
+        homework.unregister_training('STR')
+
+
+def test_register_training_limits():
+    with pytest.raises(ValueError):
+        homework.register_training(
+            'CYC', Cycling, limits={
+                'power': (0, 2000, True), 'weight': (0, 10, True),
+            },
+        )
+    assert homework.PARAM_LIMITS['weight'] == (0, 500, True), (
+        'Тип тренировки не должен менять границы известных параметров.'
+    )
+    assert 'CYC' not in homework.TRAINING_REGISTRY
+
+
+def test_run_checkpointed(tmp_path):
+    path = tmp_path / 'packages.csv'
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    lines = PACKAGES_CSV.splitlines(keepends=True)
+    path.write_text(''.join(lines[:30]) + 'SWM,720,1')
+    sink, error_sink = StringIO(), StringIO()
+    checkpoint = homework.run_checkpointed(
+        str(path), sink, error_sink, checkpoint_path, every=10, chunk_size=4,
+    )
+    assert checkpoint.rows == 30, (
+        'Недописанная последняя строка не должна обрабатываться.'
+    )
+    assert '(9 байт)' in error_sink.getvalue()
+    path.write_text(PACKAGES_CSV)
+    checkpoint = homework.run_checkpointed(
+        str(path), sink, StringIO(), checkpoint_path, every=10, chunk_size=4,
+    )
+    expected = StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, StringIO())
+    assert sink.getvalue() == expected.getvalue(), (
+        'Повторный запуск должен обрабатывать только новые строки.'
+    )
+    assert (checkpoint.rows, checkpoint.processed) == (140, 60)
+    loaded = homework.Checkpoint.load(checkpoint_path)
+    assert loaded == checkpoint
+    assert loaded.totals['Running'].trainings == 20
+    assert loaded.totals['Running'].distance == pytest.approx(20 * 9.75)
+    text = ''.join(lines[1:] + lines[:2])
+    path.write_text(text)
+    sink, expected = StringIO(), StringIO()
+    checkpoint = homework.run_checkpointed(
+        str(path), sink, StringIO(), checkpoint_path,
+    )
+    homework.run_pipeline(StringIO(text), expected, StringIO())
+    assert sink.getvalue() == expected.getvalue(), (
+        'Измененный файл должен обрабатываться с начала.'
+    )
+
+
+def test_run_cli_checkpoint(tmp_path):
+    import gzip
+
+    path = tmp_path / 'packages.csv'
+    output = tmp_path / 'results.txt.gz'
+    lines = PACKAGES_CSV.splitlines(keepends=True)
+    path.write_text(''.join(lines[:70]))
+    argv = [
+        str(path), '-o', str(output), '--checkpoint',
+        str(tmp_path / 'checkpoint.json'),
+    ]
+    homework.run_cli(argv)
+    path.write_text(PACKAGES_CSV)
+    homework.run_cli(argv)
+    with gzip.open(output, 'rt') as file:
+        assert file.read() == homework.process_text(PACKAGES_CSV)[0], (
+            'Продолжение с контрольной точки должно дописывать результаты.'
+        )
+    batch = str(tmp_path / 'packages.trpk')
+    homework.run_cli([str(path), '--convert', batch])
+    with pytest.raises(SystemExit, match='--checkpoint не поддерживается'):
+        homework.run_cli([batch, *argv[1:]])
+
+
+@pytest.mark.parametrize('extension', ['.gz', '.bz2', '.xz'])
+def test_open_input_compressed(tmp_path, extension):
+    codec = homework.detect_codec('packages.csv' + extension)
+    path = str(tmp_path / 'packages.dat')
+    with codec.open(path, 'wb') as file:
+        file.write(PACKAGES_CSV.encode())
+    assert homework.detect_codec(path) is codec, (
+        'Формат сжатия должен определяться по первым байтам файла.'
+    )
+    expected = StringIO()
+    homework.run_pipeline(StringIO(PACKAGES_CSV), expected, StringIO())
+    for read_ahead in (True, False):
+        sink = StringIO()
+        with homework.open_input(path, read_ahead) as reader:
+            homework.run_pipeline(reader, sink, StringIO())
+        assert sink.getvalue() == expected.getvalue()
+    output = str(tmp_path / ('results.txt' + extension))
+    with homework.open_output(output) as file:
+        file.write(expected.getvalue())
+    with homework.open_input(output) as reader:
+        assert reader.read() == expected.getvalue()
+
+
+def test_read_ahead_reader_error(tmp_path):
+    path = tmp_path / 'packages.csv.gz'
+    path.write_bytes(b'\x1f\x8b' + b'\x00' * 64)
+    with pytest.raises(OSError):
+        with homework.open_input(str(path)) as reader:
+            reader.read()
+    plain = tmp_path / 'plain.gz'
+    plain.write_text(PACKAGES_CSV)
+    assert homework.detect_codec(str(plain)) is None
+    with homework.open_input(str(plain)) as reader:
+        assert reader.read() == PACKAGES_CSV
+
+
+@pytest.mark.parametrize('output_format', ['text', 'binary'])
+def test_run_threaded(output_format):
+    expected, expected_errors = homework.process_text(
+        PACKAGES_CSV, output_format,
+    )[:2]
+    Sink = BytesIO if output_format == 'binary' else StringIO
+    sink, error_sink = Sink(), StringIO()
+    stats = homework.run_threaded(
+        StringIO(PACKAGES_CSV),
+        sink,
+        error_sink,
+        output_format,
+        block_size=50,
+        depth=1,
+    )
+    assert sink.getvalue() == expected, (
+        '`run_threaded` должна выводить те же результаты в том же порядке.'
+    )
+    assert error_sink.getvalue() == expected_errors
+    assert (stats.processed, stats.rejected) == (60, 80)
+    assert list(homework.read_blocks(StringIO('a\nbb\nc'), 3)) == [
+        'a\n', 'bb\n', 'c',
+    ]
+
+
+def test_run_threaded_write_error():
+    class BrokenSink(StringIO):
+        def write(self, text):
+            raise OSError('No space left on device')
+
+    with pytest.raises(OSError):
+        homework.run_threaded(
+            StringIO(PACKAGES_CSV * 10), BrokenSink(), StringIO(),
+            block_size=50, depth=1,
+        )
+
+
+def test_run_jobs(tmp_path):
+    import gzip
+
+    shards = tmp_path / 'shards'
+    (shards / 'day2').mkdir(parents=True)
+    lines = PACKAGES_CSV.splitlines(keepends=True)
+    (shards / 'a.csv').write_text(''.join(lines[:100]))
+    with gzip.open(shards / 'day2' / 'b.csv.gz', 'wt') as file:
+        file.write(''.join(lines[100:]))
+    (shards / 'day2' / 'broken.csv.gz').write_bytes(b'\x1f\x8b' + b'\x00' * 8)
+    output_dir = tmp_path / 'results'
+    report = StringIO()
+    summary = homework.run_jobs(
+        [str(shards / '**' / '*.csv*')], str(output_dir), 2, report=report,
+    )
+    assert [shard.path for shard in summary.shards] == sorted(
+        str(path) for path in (
+            shards / 'a.csv',
+            shards / 'day2' / 'b.csv.gz',
+            shards / 'day2' / 'broken.csv.gz',
+        )
+    )
+    assert summary.failed == 1, (
+        'Ошибка одного файла не должна останавливать остальные.'
+    )
+    expected = homework.process_text(''.join(lines[100:]))[0]
+    assert (output_dir / 'day2' / 'b.txt').read_text() == expected
+    assert (summary.processed, summary.rejected) == (60, 80)
+    assert summary.totals['Running'].trainings == 20
+    saved = json.loads((output_dir / homework.SUMMARY_FILE).read_text())
+    assert saved['totals']['Running']['trainings'] == 20
+    assert all('rows_per_sec' in shard for shard in saved['shards'])
+    assert report.getvalue().count('\n') == 4
+    (shards / 'day2' / 'b.csv').write_text(''.join(lines[:10]))
+    with pytest.raises(ValueError):
+        homework.run_jobs([str(shards / '**' / '*.csv*')], str(output_dir))
+    assert (output_dir / 'day2' / 'b.txt').read_text() == expected, (
+        'Файлы с одинаковыми путями результатов не должны обрабатываться.'
+    )
+
+
+@pytest.mark.parametrize('option', [
+    ['--metrics-out', '{tmp}/metrics.json'],
+    ['--cache', '{tmp}/cache.json'],
+    ['--dedup', '5'],
+    ['--adaptive'],
+])
+@pytest.mark.parametrize('mode, message', [
+    (['-w', '2'], 'не поддерживается вместе с --workers'),
+    (['--checkpoint', '{tmp}/c.json'], 'не поддерживается вместе с'),
+    (['--convert'], 'не поддерживается для двоичных файлов'),
+])
+def test_run_cli_run_file_options(tmp_path, option, mode, message):
+    path = str(tmp_path / 'packages.csv')
+    with open(path, 'w') as file:
+        file.write(PACKAGES_CSV)
+    if mode == ['--convert']:
+        homework.run_cli([path, '--convert', str(tmp_path / 'packages.trpk')])
+        path, mode = str(tmp_path / 'packages.trpk'), []
+    argv = [arg.format(tmp=tmp_path) for arg in [*mode, *option]]
+    with pytest.raises(SystemExit, match=f'{option[0]} {message}'):
+        homework.run_cli([path, *argv])
+    assert {file.name for file in tmp_path.iterdir()} <= {
+        'packages.csv', 'packages.trpk',
+    }, 'Отклоненный запуск не должен создавать файлы.'
+
+
+@pytest.mark.parametrize('options, message', [
+    (['--pipelined', '-w', '2'], '--pipelined не поддерживается вместе'),
+    (['--pipelined', '--checkpoint', 'c.json'], '--pipelined не'),
+    (['-w', '2', '--checkpoint', 'c.json'], '--workers не поддерживается'),
+    (['--unordered'], '--unordered используется только вместе с --workers'),
+    (['--dedup-bloom', '100'], '--dedup-bloom используется только'),
+    (['--dedup-key-column', '0'], '--dedup-key-column используется только'),
+])
+def test_run_cli_conflicts(tmp_path, options, message):
+    path = tmp_path / 'packages.csv'
+    path.write_text(PACKAGES_CSV)
+    output = tmp_path / 'results.txt'
+    output.write_text('прошлые результаты')
+    with pytest.raises(SystemExit, match=message):
+        homework.run_cli([str(path), '-o', str(output), *options])
+    assert output.read_text() == 'прошлые результаты', (
+        'Отклоненный запуск не должен затирать файл -o.'
+    )
+
+
+def test_run_cli_adaptive_pipelined(tmp_path, capsys):
+    path = tmp_path / 'packages.csv'
+    path.write_text(PACKAGES_CSV)
+    with pytest.raises(SystemExit):
+        homework.run_cli([str(path), '--adaptive', '--pipelined'])
+    assert 'not allowed with argument --adaptive' in capsys.readouterr().err
+
+
+def test_run_cli_workers(tmp_path, capsys):
+    path = tmp_path / 'packages.csv'
+    path.write_text(PACKAGES_CSV)
+    with pytest.raises(SystemExit):
+        homework.run_cli([str(path), '-w', '0'])
+    assert '--workers должно быть не меньше 1' in capsys.readouterr().err
+    batch = str(tmp_path / 'packages.trpk')
+    homework.run_cli([str(path), '--convert', batch])
+    with pytest.raises(SystemExit, match='--pipelined не поддерживается'):
+        homework.run_cli([batch, '--pipelined'])
+
+
+@pytest.mark.parametrize('options, message', [
+    (['--cache', 'cache.json'], '--cache не поддерживается вместе с --jobs'),
+    (['--dedup', '5'], '--dedup не поддерживается вместе с --jobs'),
+    (['--pipelined'], '--pipelined не поддерживается вместе с --jobs'),
+    (['-o', 'out.txt'], '--output не поддерживается вместе с --jobs'),
+])
+def test_run_cli_jobs_options(tmp_path, options, message):
+    argv = ['--jobs', str(tmp_path / '*.csv'), '--output-dir', str(tmp_path)]
+    with pytest.raises(SystemExit, match=message):
+        homework.run_cli([*argv, *options])
+    assert not (tmp_path / homework.SUMMARY_FILE).exists()
+    with pytest.raises(SystemExit, match='--sketches используется только'):
+        homework.run_cli([str(tmp_path / 'packages.csv'), '--sketches'])
+
+
+def test_totals_exact():
+    import random
+
+    rnd = random.Random(1)
+    messages = [
+        homework.InfoMessage(
+            'Running', rnd.uniform(0.1, 3), rnd.uniform(0, 1e3), 0.0,
+            rnd.uniform(0, 1e4) * 10 ** rnd.randint(-8, 8),
+        )
+        for _ in range(2000)
+    ]
+    serial = homework.empty_totals()
+    for message in messages:
+        serial.add(message)
+        assert max(map(len, serial.columns)) <= 2 * homework.COMPACT_SIZE, (
+            'Итоги должны занимать ограниченную память.'
+        )
+    assert serial.calories == math.fsum(
+        message.calories for message in messages
+    )
+    rnd.shuffle(messages)
+    merged = homework.empty_totals()
+    for start in range(0, len(messages), 333):
+        chunk = homework.empty_totals()
+        for message in messages[start:start + 333]:
+            chunk.add(message)
+        merged.merge(chunk)
+    assert (merged.duration, merged.distance, merged.calories) == (
+        serial.duration, serial.distance, serial.calories,
+    ), 'Итоги не должны зависеть от порядка и разбиения на блоки.'
+    merged.subtract(chunk)
+    rest = homework.empty_totals()
+    for message in messages[:start]:
+        rest.add(message)
+    assert merged.calories == rest.calories
+    for value in (math.inf, math.nan):
+        with pytest.raises(ValueError):
+            serial.add(homework.InfoMessage('Running', 1.0, value, 0.0, 1.0))
+        with pytest.raises(ValueError):
+            homework.UserAggregator().add('alice', value, messages[0])
+    assert serial.trainings == 2000, 'Отклоненное сообщение не учитывается.'
+    assert math.isnan(homework.exact_partials([1.0, math.nan])[0])
+    assert homework.exact_partials([math.inf, 1.0]) == [math.inf]
+
+
+def test_session():
+    tracker = homework.SessionTracker(max_sessions=2, max_splits=4)
+    running = tracker.open('run', 'RUN', 0.0, weight=75)
+    splits = []
+    for second in range(1, 3601):
+        splits += tracker.add('run', float(second), 15000 / 3600)
+    assert [split.number for split in splits] == list(range(1, 10)), (
+        'Отрезок должен завершаться на каждом пройденном километре.'
+    )
+    assert splits[0].pace == pytest.approx(60 / 9.75)
+    assert len(running.splits) == 4 and len(running.recent) == 60, (
+        'Кольцевые буферы сессии не должны расти с ее длительностью.'
+    )
+    assert running.current_speed == pytest.approx(9.75)
+    message = tracker.close('run')
+    expected = homework.read_package('RUN', [15000, 1, 75]).get_metrics()
+    assert (message.distance, message.speed, message.calories) == (
+        pytest.approx(expected)
+    ), 'Показатели сессии должны совпадать с расчетом по итогам.'
+    swimming = tracker.open('swim', 'SWM', 0.0, weight=80, length_pool=25)
+    for lap in range(1, 41):
+        (split,) = tracker.add('swim', 90.0 * lap, 18)
+    assert (split.number, split.seconds, split.pace) == (40, 90.0, 60.0)
+    assert swimming.show_training_info() == homework.read_package(
+        'SWM', [720, 1, 80, 25, 40],
+    ).show_training_info()
+    with pytest.raises(homework.InvalidInputDataError):
+        tracker.add('swim', 10.0, 18)
+    with pytest.raises(homework.RejectedPackageError):
+        tracker.open('walk', 'WLK', 0.0, weight=75)
+    for timestamp, count in ((4000.0, -5), (math.nan, 5), (4000.0, math.inf)):
+        with pytest.raises(homework.RejectedPackageError):
+            tracker.add('swim', timestamp, count)
+    assert swimming.laps == 40, 'Отклоненный замер не должен учитываться.'
+    long_run = tracker.open('long', 'RUN', 0.0, weight=75)
+    long_run.add(30 * 3600.0, 5_000_000)
+    with pytest.raises(homework.RejectedPackageError, match='out_of_range'):
+        long_run.show_training_info()
+    for options in ({'split_km': 0}, {'max_splits': 0}, {'recent': 0}):
+        with pytest.raises(ValueError):
+            homework.Session('RUN', 0.0, {'weight': 75}, **options)
+
+
+def test_result_store(tmp_path, monkeypatch):
+    import random
+    from datetime import date
+
+    import homework.store
+
+    monkeypatch.setattr(homework.store, 'STORE_BATCH', 50)
+    monkeypatch.setattr(homework.store, 'LEADERS_SIZE', 5)
+    rnd = random.Random(2)
+    days = [date(2022, 10, day) for day in range(1, 8)]
+    rows = [
+        (
+            f'user{rnd.randrange(5)}', rnd.choice(('Running', 'Swimming')),
+            rnd.choice(days).isoformat(), rnd.uniform(0.2, 3),
+            rnd.uniform(0, 20), rnd.uniform(1, 15), rnd.uniform(10, 900),
+        )
+        for _ in range(400)
+    ]
+    with homework.ResultStore(str(tmp_path / 'results.db')) as store:
+        with store.bulk_load():
+            assert store.insert_rows(rows[:150]) == 150
+        assert store.insert_rows(rows[150:]) == 250
+        for count, training_type in ((3, None), (5, 'Swimming'), (7, None)):
+            expected = sorted(
+                (row for row in rows if training_type in (None, row[1])),
+                key=lambda row: row[6],
+                reverse=True,
+            )[:count]
+            assert [
+                dataclasses.astuple(result)
+                for result in store.top('calories', count, training_type)
+            ] == expected, 'Лучшие результаты должны совпадать с полными.'
+        selected = [
+            row for row in rows
+            if row[0] == 'user1' and '2022-10-02' <= row[2] <= '2022-10-05'
+        ]
+        totals = store.totals('user1', days[1], days[4])
+        assert {
+            name: group.trainings for name, group in totals.items()
+        } == {
+            name: sum(row[1] == name for row in selected)
+            for name in {row[1] for row in selected}
+        }
+        assert totals['Running'].distance == math.fsum(
+            row[4] for row in selected if row[1] == 'Running'
+        )
+        running = store.totals()['Running']
+        assert running.calories == math.fsum(
+            row[6] for row in rows if row[1] == 'Running'
+        ), 'Итоги должны быть правильно округленной суммой.'
+        with pytest.raises(ValueError):
+            store.top('weight')
+    with homework.ResultStore(str(tmp_path / 'results.db')) as store:
+        error = homework.InvalidInputDataError('Нет данных')
+        message = homework.read_package(
+            'RUN', [40000, 1, 75],
+        ).show_training_info()
+        assert list(store.record([error, message], 'user9', days[0])) == [
+            error, message,
+        ], 'Результаты должны передаваться дальше без изменений.'
+        assert store.top('speed', 1)[0] == homework.StoredResult(
+            'user9', message.training_type, '2022-10-01', message.duration,
+            message.distance, message.speed, message.calories,
+        )
+
+
+def test_sketches(tmp_path):
+    import random
+
+    rnd = random.Random(3)
+    values = [rnd.lognormvariate(2, 1) for _ in range(5000)] + [0.0, -3.5]
+    whole = homework.QuantileSketch()
+    parts = [homework.QuantileSketch() for _ in range(3)]
+    for index, value in enumerate(values):
+        whole.add(value)
+        parts[index % 3].add(value)
+    merged = homework.QuantileSketch.from_dict(
+        json.loads(json.dumps(parts[0].as_dict())),
+    )
+    for part in parts[1:]:
+        merged.merge(part)
+    values.sort()
+    for q in (0, 0.01, 0.25, 0.5, 0.9, 0.99, 1):
+        exact = values[int(q * (len(values) - 1))]
+        assert merged.quantile(q) == whole.quantile(q)
+        assert abs(whole.quantile(q) - exact) <= whole.alpha * abs(exact), (
+            'Погрешность квантиля должна быть не больше alpha.'
+        )
+    with pytest.raises(ValueError):
+        whole.merge(homework.QuantileSketch(alpha=0.05))
+    assert math.isnan(homework.QuantileSketch().quantile(0.5))
+    users = homework.HyperLogLog()
+    other = homework.HyperLogLog()
+    for number in range(20000):
+        users.add(f'user{number}')
+        other.add(f'user{number + 10000}')
+    users.merge(homework.HyperLogLog.from_dict(other.as_dict()))
+    assert abs(len(users) - 30000) <= 3 * users.error * 30000
+    shards = tmp_path / 'shards'
+    shards.mkdir()
+    lines = PACKAGES_CSV.splitlines(keepends=True)
+    (shards / 'a.csv').write_text(''.join(lines[:70]))
+    (shards / 'b.csv').write_text(''.join(lines[70:]))
+    summary = homework.run_jobs(
+        [str(shards)], str(tmp_path / 'results'), 1, sketches=True,
+    )
+    expected = homework.TrainingSketches()
+    for _ in homework.sketch_messages(
+        homework.compute_messages(homework.validate_packages(
+            homework.check_packages(homework.parse_packages(
+                csv.reader(StringIO(PACKAGES_CSV)),
+            )),
+        )),
+        expected,
+    ):
+        pass
+    saved = json.loads(
+        (tmp_path / 'results' / homework.SUMMARY_FILE).read_text(),
+    )
+    loaded = homework.TrainingSketches.from_dict(saved['sketches'])
+    for sketches in (summary.sketches, loaded):
+        assert sketches.as_dict() == expected.as_dict(), (
+            'Скетчи файлов должны сливаться в скетчи всего потока.'
+        )
+
+
+def test_dedup_index():
+    now = [0.0]
+    index = homework.DedupIndex(ttl=60, max_keys=3, clock=lambda: now[0])
+    packages = [
+        ('RUN', [15000.0, 1.0, 75.0]),
+        ('RUN', [15000.0, 1.0, 75.0]),
+        ('RUN', [15000.0, 1.0, 76.0]),
+        homework.InvalidInputDataError('Нет данных'),
+    ]
+    assert list(index.filter(packages)) == [packages[0], *packages[2:]], (
+        'Повтор пакета должен отбрасываться.'
+    )
+    assert list(index.filter(packages[:1], device_id='watch')) == [
+        packages[0],
+    ], 'Пакеты разных устройств не являются повторами.'
+    now[0] = 60.0
+    assert list(index.filter(packages[:1])) == packages[:1], (
+        'Ключ должен вытесняться по истечении ttl.'
+    )
+    for value in range(5):
+        index.seen(bytes([value]) * 16)
+    assert len(index) == 3 and index.evicted == 6
+    assert (index.checked, index.duplicates) == (10, 1)
+    assert index.dedup_rate == 0.1 and index.false_positive_rate == 0.0
+    text = '\n'.join(['RUN,15000,1,75', 'RUN, 15000.0,1,75', 'SWM,x'] * 2)
+    output, errors, stats = homework.process_text(
+        text, dedup=homework.DedupIndex(),
+    )
+    assert output == homework.process_text('RUN,15000,1,75')[0]
+    assert (stats.processed, stats.rejected) == (1, 2)
+    text = 'w1,RUN,15000,1,75\nw2,RUN,15000,1,75\nw1,RUN,15000.0,1,75\nw3'
+    output, errors, stats = homework.process_text(
+        text, dedup=homework.DedupIndex(key_column=0),
+    )
+    assert output == homework.process_text('RUN,15000,1,75')[0] * 2, (
+        'Одинаковые пакеты разных устройств не являются повторами.'
+    )
+    assert (stats.processed, stats.rejected) == (2, 1)
+
+
+def test_bloom_dedup_index():
+    now = [0.0]
+    index = homework.BloomDedupIndex(
+        ttl=60, capacity=1000, error=0.01, clock=lambda: now[0],
+    )
+    keys = [
+        homework.package_key(('RUN', [float(action), 1.0, 75.0]))
+        for action in range(3000)
+    ]
+    assert sum(index.seen(key) for key in keys[:1000]) <= 20
+    assert all(index.seen(key) for key in keys[:1000]), (
+        'В фильтре Блума не бывает пропущенных повторов.'
+    )
+    false_positives = sum(index.seen(key) for key in keys[1000:2000])
+    assert false_positives <= 40
+    assert 0 < index.false_positive_rate <= 0.03
+    now[0] = 120.0
+    index.seen(keys[2000])
+    now[0] = 180.0
+    assert not index.seen(keys[0]), (
+        'Ключ должен забываться после двух смен фильтров.'
+    )
+
+
+def test_adaptive_batcher():
+    batcher = homework.AdaptiveBatcher(slo=0.05, max_size=256, size=64)
+    batcher.observe(64, 0.001, 0.002, depth=500)
+    assert batcher.size == 128, 'При очереди пакет должен расти.'
+    batcher.observe(128, 0.002, 0.003, depth=10)
+    assert batcher.size == 128, 'Без очереди размер не должен меняться.'
+    for _ in range(3):
+        batcher.observe(batcher.size, 0.001, 0.002, depth=1000)
+    assert batcher.size == 256, 'Размер не должен превышать max_size.'
+    batcher.observe(256, 0.04, 0.06, depth=1000)
+    assert (batcher.size, batcher.shrunk, batcher.violations) == (128, 1, 1)
+    assert 0 <= batcher.flush_interval <= 0.025
+    assert batcher.capacity >= batcher.size
+    snapshot = batcher.snapshot()
+    assert snapshot['batches'] == 6 and snapshot['latency_p99'] == 0.06
+
+
+def test_run_adaptive():
+    import time
+
+    output = StringIO()
+    batcher = homework.AdaptiveBatcher()
+    stats = homework.run_adaptive(
+        StringIO(PACKAGES_CSV), output, StringIO(), batcher=batcher,
+    )
+    expected, _, expected_stats = homework.process_text(PACKAGES_CSV)
+    assert output.getvalue() == expected
+    assert stats == expected_stats and batcher.items == stats.rejected + (
+        stats.processed
+    )
+
+    def trickle():
+        for _ in range(5):
+            time.sleep(0.05)
+            yield 'RUN,15000,1,75\n'
+
+    batcher = homework.AdaptiveBatcher(slo=0.01)
+    homework.run_adaptive(trickle(), StringIO(), StringIO(), batcher=batcher)
+    assert batcher.batches == 5, (
+        'Редкие строки должны выводиться, не дожидаясь полного пакета.'
+    )
+
+    def broken():
+        yield 'RUN,15000,1,75\n'
+        raise OSError('Ошибка чтения')
+
+    with pytest.raises(OSError):
+        homework.run_adaptive(broken(), StringIO(), StringIO())